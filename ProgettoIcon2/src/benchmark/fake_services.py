@@ -0,0 +1,125 @@
+"""Finti OSRM / Wikipedia / SPARQL in locale per il benchmark.
+
+Un solo ``ThreadingHTTPServer`` su 127.0.0.1 risponde a:
+• ``/table/v1/<profile>/<lon,lat;...>``  → durations Haversine a 5 km/h × 1.3
+• ``/api/rest_v1/page/html/<title>``     → HTML con una fascia oraria (≈10% 404)
+• ``/sparql?query=...``                  → binding JSON del catalogo (rispetta LIMIT)
+
+Gli script puntano al server tramite le variabili d'ambiente restituite da
+``FakeServices.env()`` (SMARTTOUR_OSRM_URL, SMARTTOUR_WIKI_URL,
+SMARTTOUR_SPARQL_URL, SMARTTOUR_HTTP_PAUSE).
+
+Uso:
+    with FakeServices(catalogue_df) as fake:
+        subprocess.run([...], env={**os.environ, **fake.env()})
+"""
+from __future__ import annotations
+
+import json, re, threading, zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, unquote, urlparse
+import numpy as np
+import pandas as pd
+
+WALK_MS = 1.388      # 5 km/h
+DETOUR  = 1.3        # rapporto medio rete stradale / linea d'aria
+
+
+def _durations(coords: np.ndarray) -> list[list[float]]:
+    lat, lon = np.radians(coords[:, 1]), np.radians(coords[:, 0])
+    dphi = lat[:, None] - lat[None, :]
+    dlam = lon[:, None] - lon[None, :]
+    a = np.sin(dphi / 2) ** 2 + np.cos(lat)[:, None] * np.cos(lat)[None, :] * np.sin(dlam / 2) ** 2
+    meters = 2 * 6371000.0 * np.arcsin(np.sqrt(a))
+    return (meters * DETOUR / WALK_MS).round(1).tolist()
+
+
+def _hours_html(title: str) -> str | None:
+    h = zlib.crc32(title.encode())
+    if h % 10 == 0:
+        return None
+    op, cl = 8 + h % 3, 16 + (h >> 3) % 4
+    return f"<html><body><table class='infobox'><tr><td>Orari</td>" \
+           f"<td>{op:02d}:00 - {cl:02d}:00</td></tr></table></body></html>"
+
+
+class _Handler(BaseHTTPRequestHandler):
+    catalogue: pd.DataFrame = pd.DataFrame()
+
+    def log_message(self, *args):         # silenzioso
+        pass
+
+    def _send(self, code: int, body: str, ctype: str = "application/json"):
+        data = body.encode()
+        self.send_response(code)
+        self.send_header("Content-Type", ctype)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        if url.path.startswith("/table/v1/"):
+            raw = unquote(url.path.split("/", 4)[4])
+            coords = np.array([[float(v) for v in c.split(",")] for c in raw.split(";")])
+            self._send(200, json.dumps({"code": "Ok", "durations": _durations(coords)}))
+        elif url.path.startswith("/api/rest_v1/page/html/"):
+            html = _hours_html(unquote(url.path.rsplit("/", 1)[-1]))
+            if html is None:
+                self._send(404, "not found", "text/plain")
+            else:
+                self._send(200, html, "text/html")
+        elif url.path.startswith("/sparql"):
+            self._sparql(parse_qs(url.query).get("query", [""])[0])
+        else:
+            self._send(404, "not found", "text/plain")
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0))).decode()
+        self._sparql(parse_qs(body).get("query", [""])[0])
+
+    def _sparql(self, query: str):
+        m = re.search(r"LIMIT\s+(\d+)", query)
+        df = self.catalogue.head(int(m.group(1))) if m else self.catalogue
+        onto = "http://dbpedia.org/ontology/"
+        bindings = [{
+            "poi":   {"type": "uri", "value": r.uri},
+            "label": {"type": "literal", "value": r.label},
+            "lat":   {"type": "literal", "value": str(r.lat)},
+            "lon":   {"type": "literal", "value": str(r.lon)},
+            "type":  {"type": "uri", "value": onto + r.type},
+        } for r in df.itertuples()]
+        self._send(200, json.dumps({"head": {"vars": ["poi", "label", "lat", "lon", "type"]},
+                                    "results": {"bindings": bindings}}),
+                   "application/sparql-results+json")
+
+
+class FakeServices:
+    """Avvia il server in un thread; ``env()`` restituisce le variabili da passare agli script."""
+
+    def __init__(self, catalogue: pd.DataFrame | None = None, port: int = 0):
+        handler = type("Handler", (_Handler,), {"catalogue": catalogue if catalogue is not None
+                                                 else pd.DataFrame()})
+        self.server = ThreadingHTTPServer(("127.0.0.1", port), handler)
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    @property
+    def url(self) -> str:
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def env(self) -> dict[str, str]:
+        return {
+            "SMARTTOUR_OSRM_URL":   self.url,
+            "SMARTTOUR_WIKI_URL":   self.url + "/api/rest_v1/page/html/",
+            "SMARTTOUR_SPARQL_URL": self.url + "/sparql",
+            "SMARTTOUR_HTTP_PAUSE": "0",
+        }
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.server.shutdown()
+        self.server.server_close()
@@ -0,0 +1,188 @@
+#!/usr/bin/env python3
+"""Benchmark di scalabilità della pipeline su città sintetiche.
+
+Per ogni N in ``--sizes`` genera una città ``bench<N>`` (synthetic_city.py),
+avvia i finti OSRM/Wikipedia/SPARQL (fake_services.py) ed esegue in ordine
+gli stadi della pipeline, ognuno in un sottoprocesso misurato da
+stage_runner.py (tempo wall, picco RSS, opz. picco tracemalloc). Le metriche
+emesse da ogni stadio tramite telemetria/telemetry.py finiscono nel report
+sotto ``metrics``; con ``--profile DIR`` si salvano anche cProfile/tracemalloc.
+Uno stadio fallito o andato in timeout fa saltare quelli che ne dipendono.
+
+Il report JSON è confrontabile fra versioni con ``--compare``: il processo
+esce con codice 1 se qualche stadio è peggiorato oltre la tolleranza.
+
+Va lanciato dalla radice del progetto (i file vanno in data/ e vengono
+rimossi a fine corsa, salvo ``--keep``).
+
+Esempi:
+    python src/benchmark/run_benchmark.py --sizes 1000 10000 50000
+    python src/benchmark/run_benchmark.py --sizes 1000 --out new.json --compare old.json
+"""
+from __future__ import annotations
+
+import argparse, json, os, platform, re, subprocess, sys, tempfile, time
+from pathlib import Path
+
+from synthetic_city import generate
+from fake_services import FakeServices
+
+SRC    = Path(__file__).resolve().parents[1]
+RUNNER = Path(__file__).resolve().parent / "stage_runner.py"
+DATA   = Path("data")
+
+# nome, script, argomenti ({city}, {n}), dipendenze, stadio di rete
+STAGES = [
+    ("harvest_poi",       "estrazione_arricchimento_dati/harvest_poi.py",  ["{city}_net", "--limit", "{n}"], [], True),
+    ("enrich_hours",      "estrazione_arricchimento_dati/enrich_hours.py", ["{city}_net"], ["harvest_poi"], True),
+    ("preprocess",        "preprocessing/preprocess.py",     ["{city}"], [], False),
+    ("clustering",        "clustering/clustering.py",        ["{city}"], ["preprocess"], False),
+    ("computer_matrix",   "matrix/computer_matrix.py",       ["{city}", "--rebuild"], ["clustering"], False),
+    ("learn_preferences", "preferenze/learn_preferences.py", ["{city}", "--samples", "10"], ["preprocess"], False),
+    ("solver_csp",        "solver/solver_csp.py",            ["{city}"], ["learn_preferences"], False),
+    ("astar_order",       "solver/astar_order.py",           ["{city}"], ["solver_csp", "computer_matrix"], False),
+    ("postcheck",         "solver/postcheck_experta.py",     ["{city}"], ["astar_order"], False),
+]
+# voti 1-5 per l'interrogazione interattiva di learn_preferences
+VOTES = "\n".join(str(1 + i % 5) for i in range(100)) + "\n"
+
+
+def run_stage(name, script, argv, env, timeout, log_dir):
+    with tempfile.NamedTemporaryFile(suffix=".json", delete=False) as tmp:
+        res_file = Path(tmp.name)
+    log = log_dir / f"{name}.log"
+    metrics_file = log_dir / f"{name}.metrics.jsonl"
+    metrics_file.unlink(missing_ok=True)
+    env = {**env, "SMARTTOUR_METRICS": str(metrics_file)}
+    cmd = [sys.executable, str(RUNNER), str(res_file), str(SRC / script), *argv]
+    t0 = time.perf_counter()
+    try:
+        with open(log, "w") as fh:
+            proc = subprocess.run(cmd, env=env, timeout=timeout, stdout=fh,
+                                  stderr=subprocess.STDOUT, text=True,
+                                  input=VOTES if name == "learn_preferences" else None)
+        res = json.loads(res_file.read_text()) if res_file.stat().st_size else \
+            dict(status="error", error=f"exit {proc.returncode}")
+    except subprocess.TimeoutExpired:
+        res = dict(status="timeout", error=f">{timeout}s", wall_s=round(time.perf_counter() - t0, 1))
+    finally:
+        res_file.unlink(missing_ok=True)
+    if metrics_file.exists():
+        res["metrics"] = [json.loads(l) for l in metrics_file.read_text().splitlines() if l]
+    if res["status"] != "ok":
+        res["log_tail"] = log.read_text(errors="replace")[-600:]
+    return res
+
+
+def cleanup(city: str):
+    pat = re.compile(rf"(^|_){re.escape(city)}(_|\.)")
+    for f in DATA.glob(f"*{city}*"):
+        if pat.search(f.name):
+            f.unlink()
+
+
+def run_size(n, args, log_root):
+    city = f"bench{n}"
+    catalogue = generate(n, seed=args.seed)
+    catalogue.to_csv(DATA / f"poi_{city}.csv", index=False, encoding="utf-8")
+    log_dir = log_root / city
+    log_dir.mkdir(parents=True, exist_ok=True)
+
+    results, state = [], {}
+    with FakeServices(catalogue) as fake:
+        env = {**os.environ, **fake.env()}
+        if args.tracemalloc:
+            env["SMARTTOUR_BENCH_TRACEMALLOC"] = "1"
+        if args.profile:
+            env["SMARTTOUR_PROFILE"] = str(Path(args.profile).resolve() / city)
+        for name, script, argv, deps, network in STAGES:
+            if name not in args.stages or (network and not args.network):
+                continue
+            failed = [d for d in deps if state.get(d, "ok") != "ok"]
+            if failed:
+                res = dict(status="skipped", error="dipendenze fallite: " + ", ".join(failed))
+            else:
+                argv = [a.format(city=city, n=n) for a in argv]
+                res = run_stage(name, script, argv, env, args.timeout, log_dir)
+            state[name] = res["status"]
+            results.append(dict(n=n, stage=name, **res))
+            wall = f"{res['wall_s']:>9.2f}s" if "wall_s" in res else f"{'-':>10}"
+            rss = f"{res['peak_rss_mb']:>8.1f} MB" if "peak_rss_mb" in res else ""
+            print(f"  N={n:<6} {name:<18} {res['status']:<8} {wall} {rss}")
+    if not args.keep:
+        cleanup(city)
+    return results
+
+
+def git_rev() -> str | None:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(new: dict, old: dict, tol: float, min_s: float, min_mb: float) -> list[str]:
+    """Regressioni di ``new`` rispetto a ``old`` (stesso N e stadio)."""
+    base = {(r["n"], r["stage"]): r for r in old["results"]}
+    out = []
+    for r in new["results"]:
+        b = base.get((r["n"], r["stage"]))
+        if b is None or b["status"] != "ok":
+            continue
+        tag = f"N={r['n']} {r['stage']}"
+        if r["status"] != "ok":
+            out.append(f"{tag}: {b['status']} → {r['status']}")
+            continue
+        for key, floor in (("wall_s", min_s), ("peak_rss_mb", min_mb)):
+            if r[key] > b[key] * (1 + tol) and r[key] - b[key] > floor:
+                out.append(f"{tag}: {key} {b[key]} → {r[key]} (+{(r[key] / b[key] - 1) * 100:.0f}%)")
+    return out
+
+
+def main():
+    par = argparse.ArgumentParser(description="Benchmark di scalabilità su città sintetiche")
+    par.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 50000])
+    par.add_argument("--stages", nargs="+", default=[s[0] for s in STAGES],
+                     choices=[s[0] for s in STAGES])
+    par.add_argument("--network", action="store_true",
+                     help="Includi harvest_poi ed enrich_hours (contro i finti servizi)")
+    par.add_argument("--timeout", type=float, default=900, help="Timeout per stadio (s)")
+    par.add_argument("--tracemalloc", action="store_true", help="Misura anche il picco Python")
+    par.add_argument("--profile", metavar="DIR", help="Salva cProfile/tracemalloc per stadio")
+    par.add_argument("--seed", type=int, default=0)
+    par.add_argument("--out", default="benchmark_report.json")
+    par.add_argument("--compare", help="Report precedente con cui confrontarsi")
+    par.add_argument("--tolerance", type=float, default=0.25, help="Peggioramento relativo ammesso")
+    par.add_argument("--keep", action="store_true", help="Non cancellare i file generati")
+    args = par.parse_args()
+
+    if not (Path.cwd() / "src").is_dir():
+        sys.exit("💥  Lancia il benchmark dalla radice del progetto")
+    DATA.mkdir(exist_ok=True)
+    log_root = Path(tempfile.mkdtemp(prefix="smarttour_bench_"))
+
+    report = dict(meta=dict(git=git_rev(), python=platform.python_version(),
+                            platform=platform.platform(), cpus=os.cpu_count(),
+                            timestamp=time.strftime("%Y-%m-%dT%H:%M:%S"),
+                            sizes=args.sizes, seed=args.seed, timeout_s=args.timeout),
+                  results=[])
+    for n in args.sizes:
+        print(f"🔄  Città sintetica bench{n}")
+        report["results"] += run_size(n, args, log_root)
+
+    Path(args.out).write_text(json.dumps(report, indent=2, ensure_ascii=False))
+    print(f"✅  Report → {args.out}   (log in {log_root})")
+
+    if args.compare:
+        regressions = compare(report, json.loads(Path(args.compare).read_text()),
+                              args.tolerance, min_s=0.5, min_mb=20)
+        for r in regressions:
+            print("⚠️ ", r)
+        if regressions:
+            sys.exit(1)
+        print("✅  Nessuna regressione rispetto a", args.compare)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,47 @@
+"""Esegue uno script della pipeline nel processo corrente e ne misura i costi.
+
+    python stage_runner.py <out.json> <script.py> [argomenti dello script…]
+
+Scrive in ``out.json``: stato, tempo wall, picco RSS del processo e, se
+``SMARTTOUR_BENCH_TRACEMALLOC=1``, il picco delle allocazioni Python.
+Lanciato da run_benchmark.py in un sottoprocesso nuovo per ogni stadio, così
+il picco di memoria è quello del solo stadio.
+"""
+from __future__ import annotations
+
+import json, os, resource, runpy, sys, time, tracemalloc
+from pathlib import Path
+
+
+def main():
+    out, script, *argv = sys.argv[1:]
+    trace = os.environ.get("SMARTTOUR_BENCH_TRACEMALLOC") == "1"
+
+    sys.argv = [script, *argv]
+    sys.path.insert(0, str(Path(script).resolve().parent))
+    if trace:
+        tracemalloc.start()
+
+    status, error = "ok", None
+    t0 = time.perf_counter()
+    try:
+        runpy.run_path(script, run_name="__main__")
+    except SystemExit as exc:
+        if exc.code not in (None, 0):
+            status, error = "error", str(exc.code)
+    except BaseException as exc:           # MemoryError compreso
+        status, error = "error", repr(exc)
+    wall = time.perf_counter() - t0
+
+    rss_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform == "darwin":           # macOS restituisce byte
+        rss_kb /= 1024
+    res = dict(status=status, error=error, wall_s=round(wall, 4),
+               peak_rss_mb=round(rss_kb / 1024, 1))
+    if trace:
+        res["py_peak_mb"] = round(tracemalloc.get_traced_memory()[1] / 2**20, 1)
+    Path(out).write_text(json.dumps(res))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""Generatore di città sintetiche per il benchmark di scalabilità.
+
+Produce un catalogo POI con le stesse colonne di harvest_poi.py
+(``uri,label,lat,lon,type``) più gli orari ``open,close`` come li scrive
+enrich_hours.py. I POI sono distribuiti attorno a ``n_centers`` centri
+(gaussiane) più una quota uniforme di "rumore" nel bounding-box.
+
+Esempio:
+    python src/benchmark/synthetic_city.py bench1000 --n 1000
+"""
+from __future__ import annotations
+
+import argparse
+from pathlib import Path
+import numpy as np
+import pandas as pd
+
+# mix di default ≈ quello di Roma (poi_rome.csv)
+DEFAULT_TYPES = {
+    "Church": 0.30, "HistoricBuilding": 0.25, "Museum": 0.12, "Monument": 0.08,
+    "Park": 0.07, "ArchaeologicalSite": 0.06, "Bridge": 0.05, "Theatre": 0.04,
+    "Gallery": 0.03,
+}
+# (probabilità, apertura, chiusura)
+DEFAULT_HOURS = [
+    (0.45, "09:00", "18:00"), (0.15, "08:00", "13:00"), (0.15, "10:00", "19:00"),
+    (0.10, "00:00", "24:00"), (0.10, "14:00", "20:00"), (0.05, "09:00", "16:00"),
+]
+
+
+def generate(n: int, types: dict[str, float] | None = None,
+             hours: list[tuple[float, str, str]] | None = None,
+             center: tuple[float, float] = (41.9, 12.49), spread_km: float = 8.0,
+             n_centers: int = 12, cluster_std_km: float = 0.6,
+             noise: float = 0.2, seed: int = 0) -> pd.DataFrame:
+    """Restituisce un DataFrame di ``n`` POI sintetici."""
+    rng = np.random.default_rng(seed)
+    types = types or DEFAULT_TYPES
+    hours = hours or DEFAULT_HOURS
+
+    km_lat = 1 / 110.574
+    km_lon = 1 / (111.320 * np.cos(np.radians(center[0])))
+
+    # --- posizioni: misture gaussiane + rumore uniforme ---
+    centers = rng.uniform(-spread_km, spread_km, (n_centers, 2))
+    is_noise = rng.random(n) < noise
+    which = rng.integers(0, n_centers, n)
+    xy = centers[which] + rng.normal(0, cluster_std_km, (n, 2))
+    xy[is_noise] = rng.uniform(-spread_km, spread_km, (is_noise.sum(), 2))
+    lat = center[0] + xy[:, 1] * km_lat
+    lon = center[1] + xy[:, 0] * km_lon
+
+    # --- tipi e orari ---
+    t_names = list(types)
+    t_prob = np.array([types[t] for t in t_names], float)
+    typ = rng.choice(t_names, n, p=t_prob / t_prob.sum())
+    h_prob = np.array([h[0] for h in hours], float)
+    h_pick = rng.choice(len(hours), n, p=h_prob / h_prob.sum())
+
+    labels = [f"{t} sintetico {i}" for i, t in enumerate(typ)]
+    return pd.DataFrame({
+        "uri":   [f"http://example.org/resource/Synthetic_{i}" for i in range(n)],
+        "label": labels,
+        "lat":   lat.round(7),
+        "lon":   lon.round(7),
+        "type":  typ,
+        "open":  [hours[h][1] for h in h_pick],
+        "close": [hours[h][2] for h in h_pick],
+    })
+
+
+def main():
+    par = argparse.ArgumentParser(description="Genera un catalogo POI sintetico")
+    par.add_argument("city", help="Nome della città sintetica (es. bench1000)")
+    par.add_argument("--n", type=int, default=1000)
+    par.add_argument("--centers", type=int, default=12, help="Numero di addensamenti")
+    par.add_argument("--noise", type=float, default=0.2, help="Quota di POI sparsi")
+    par.add_argument("--seed", type=int, default=0)
+    args = par.parse_args()
+
+    df = generate(args.n, n_centers=args.centers, noise=args.noise, seed=args.seed)
+    out = Path("data") / f"poi_{args.city.lower()}.csv"
+    out.parent.mkdir(exist_ok=True)
+    df.to_csv(out, index=False, encoding="utf-8")
+    print(f"✅  {len(df)} POI sintetici → {out}")
+
+
+if __name__ == "__main__":
+    main()
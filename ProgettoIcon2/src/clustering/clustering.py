@@ -1,69 +1,172 @@
 #!/usr/bin/env python3
-"""Clustering "potenziato" dei POI (fix definitivo mismatch lunghezze)."""
+"""Clustering "potenziato" dei POI (fix definitivo mismatch lunghezze).
+
+Il modello scelto è salvato in ``data/cluster_model_<city>.pkl`` accanto a
+``pipeline_<city>.pkl``. Con ``--assign`` i POI nuovi di ``poi_<city>.csv``
+(URI assenti da ``poi_<city>_cluster.csv``) ricevono un'etichetta con
+``predict`` (k-means) o ``approximate_predict`` (HDBSCAN), senza rifare il fit.
+Il controllo di drift fa ripartire il fit completo solo quando serve:
+  • k-means: troppi POI nuovi oltre il 95° percentile della distanza dal
+    centroide misurata sul training
+  • HDBSCAN: troppi POI nuovi classificati come rumore
+  • in entrambi i casi: troppi POI aggiunti dall'ultimo fit (cumulativo:
+    contano anche quelli assegnati nei ``--assign`` precedenti)
+"""
 from __future__ import annotations
 
-import argparse
+import argparse, sys
 from pathlib import Path
+import joblib
 import pandas as pd
 import numpy as np
 from sklearn.cluster import MiniBatchKMeans
 from sklearn.metrics import silhouette_score, davies_bouldin_score
 
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from telemetria import telemetry as tm
+from preprocessing.preprocess import add_features
+
 try:
     import hdbscan
 except ImportError:
     hdbscan = None
 
-parser = argparse.ArgumentParser()
-parser.add_argument("city")
-parser.add_argument("--alg", choices=["kmeans", "hdbscan"], default="kmeans")
-parser.add_argument("--k-min", type=int, default=4)
-parser.add_argument("--k-max", type=int, default=12)
-args = parser.parse_args()
-city = args.city.lower()
-
-PREPFILE = Path(f"data/poi_{city}_prep.csv")
-RAWFILE  = Path(f"data/poi_{city}.csv")
-OUTFILE  = Path(f"data/poi_{city}_cluster.csv")
-
-if not PREPFILE.exists():
-    raise FileNotFoundError("Preprocessed CSV mancante: esegui preprocess.py")
-
-df_num = pd.read_csv(PREPFILE, header=None)
-X = df_num.values
-
-# ---------------- Clustering ----------------
-if args.alg == "kmeans":
-    best_k, best_model, best_score = None, None, -1
-    for k in range(args.k_min, args.k_max + 1):
-        km = MiniBatchKMeans(n_clusters=k, random_state=0, batch_size=1024)
-        labels = km.fit_predict(X)
-        score = silhouette_score(X, labels, sample_size=min(10000, X.shape[0]))
-        print(f"k={k:<2} → silhouette={score:.3f}")
-        if score > best_score:
-            best_k, best_model, best_score = k, km, score
-    final_labels = best_model.labels_
-    print(f"✔︎ k scelto: {best_k}  (silhouette={best_score:.3f})")
-else:
+DRIFT_FRAC = 0.2       # quota di POI nuovi "anomali" oltre cui si rifà il fit
+GROWTH_MAX = 0.25      # quota di POI aggiunti dall'ultimo fit oltre cui si rifà il fit
+
+
+# ---------------- Fit completo ----------------
+def fit(X: np.ndarray, alg: str, k_min: int, k_max: int) -> dict:
+    """Sweep su k (k-means) o HDBSCAN; restituisce il bundle da salvare."""
+    if alg == "kmeans":
+        best_k, best_model, best_score = None, None, -1
+        for k in range(k_min, k_max + 1):
+            km = MiniBatchKMeans(n_clusters=k, random_state=0, batch_size=1024)
+            with tm.timer("kmeans.fit_s", k=k):
+                labels = km.fit_predict(X)
+            with tm.timer("kmeans.silhouette_s", k=k):
+                score = silhouette_score(X, labels, sample_size=min(10000, X.shape[0]))
+            print(f"k={k:<2} → silhouette={score:.3f}")
+            if score > best_score:
+                best_k, best_model, best_score = k, km, score
+        print(f"✔︎ k scelto: {best_k}  (silhouette={best_score:.3f})")
+        dist = best_model.transform(X).min(axis=1)
+        return dict(alg=alg, model=best_model, labels=best_model.labels_, n_fit=len(X),
+                    silhouette=best_score, dist_p95=float(np.percentile(dist, 95)))
+
     if hdbscan is None:
         raise SystemExit("Install hdbscan or use kmeans")
-    clusterer = hdbscan.HDBSCAN(min_cluster_size=15)
-    final_labels = clusterer.fit_predict(X)
+    clusterer = hdbscan.HDBSCAN(min_cluster_size=15, prediction_data=True)
+    with tm.timer("hdbscan.fit_s"):
+        labels = clusterer.fit_predict(X)
+    return dict(alg=alg, model=clusterer, labels=labels, n_fit=len(X),
+                noise_frac=float(np.mean(labels == -1)))
 
-# --------------- Output DF ---------------
-labels_len = len(final_labels)
-try:
-    df_raw = pd.read_csv(RAWFILE)
-except FileNotFoundError:
-    df_raw = pd.DataFrame()
 
-common_n = min(labels_len, len(df_raw))
+# ---------------- Assegnazione incrementale ----------------
+def assign(bundle: dict, X: np.ndarray, n_known: int | None = None) -> tuple[np.ndarray, dict]:
+    """Etichette per i POI nuovi + diagnostica di drift (``drift=True`` → refit).
+
+    ``n_known`` = POI già etichettati (fit + assegnazioni precedenti, default
+    solo il fit): la crescita si misura dall'ultimo fit, non per singolo lotto."""
+    n_fit = bundle["n_fit"]
+    n_known = n_fit if n_known is None else n_known
+    if bundle["alg"] == "kmeans":
+        km = bundle["model"]
+        labels = km.predict(X)
+        outlier = float(np.mean(km.transform(X).min(axis=1) > bundle["dist_p95"]))
+    else:
+        labels, _ = hdbscan.approximate_predict(bundle["model"], X)
+        # il rumore "atteso" è quello già presente nel fit
+        outlier = max(0.0, float(np.mean(labels == -1)) - bundle["noise_frac"])
+    growth = (n_known + len(X) - n_fit) / max(1, n_fit)
+    drift = outlier > DRIFT_FRAC or growth > GROWTH_MAX
+    return labels, dict(outlier_frac=outlier, growth=growth, drift=drift)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("city")
+    parser.add_argument("--alg", choices=["kmeans", "hdbscan"], default="kmeans")
+    parser.add_argument("--k-min", type=int, default=4)
+    parser.add_argument("--k-max", type=int, default=12)
+    parser.add_argument("--assign", action="store_true",
+                        help="Etichetta solo i POI nuovi col modello salvato (refit se c'è drift)")
+    args = parser.parse_args()
+    city = args.city.lower()
+    tm.setup("clustering")
+
+    PREPFILE = Path(f"data/poi_{city}_prep.csv")
+    RAWFILE  = Path(f"data/poi_{city}.csv")
+    OUTFILE  = Path(f"data/poi_{city}_cluster.csv")
+    PIPE     = Path(f"data/pipeline_{city}.pkl")
+    MODEL    = Path(f"data/cluster_model_{city}.pkl")
+
+    if args.assign:
+        if not (MODEL.exists() and OUTFILE.exists() and PIPE.exists()):
+            raise SystemExit("💥  --assign richiede cluster_model, pipeline e poi_<city>_cluster.csv: "
+                             "esegui prima il clustering completo")
+        bundle = joblib.load(MODEL)
+        df_raw = pd.read_csv(RAWFILE)
+        df_old = pd.read_csv(OUTFILE)
+        new = df_raw[~df_raw["uri"].isin(df_old["uri"])]
+        if new.empty:
+            print("✅  Nessun POI nuovo da assegnare")
+            return
+
+        with tm.timer("assign.transform_s"):
+            X_new = joblib.load(PIPE).transform(add_features(new))
+        if hasattr(X_new, "toarray"):
+            X_new = X_new.toarray()
+        with tm.timer("assign.predict_s"):
+            labels, diag = assign(bundle, X_new, n_known=len(df_old))
+        tm.event("assign", n_new=len(new), alg=bundle["alg"], **diag)
+
+        if not diag["drift"]:
+            df_out = pd.concat([df_old, new.assign(cluster=labels)], ignore_index=True)
+            df_out.to_csv(OUTFILE, index=False)
+            print(f"✅  {len(new)} POI nuovi assegnati senza refit "
+                  f"(anomali={diag['outlier_frac']:.0%}, crescita={diag['growth']:.0%}) → {OUTFILE}")
+            return
+        print(f"⚠️  Drift rilevato (anomali={diag['outlier_frac']:.0%}, "
+              f"crescita={diag['growth']:.0%}): rifaccio il fit completo")
+        if len(pd.read_csv(PREPFILE, usecols=[0])) != len(df_raw):
+            raise SystemExit("💥  poi_<city>_prep.csv non aggiornato: riesegui preprocess.py")
+        args.alg = bundle["alg"]
+
+    if not PREPFILE.exists():
+        raise FileNotFoundError("Preprocessed CSV mancante: esegui preprocess.py")
+
+    # la prima riga del CSV è l'intestazione delle colonne (0, 1, …), non un POI
+    df_num = pd.read_csv(PREPFILE)
+    X = df_num.values
+
+    # ---------------- Clustering ----------------
+    bundle = fit(X, args.alg, args.k_min, args.k_max)
+    final_labels = bundle.pop("labels")
+    joblib.dump(bundle, MODEL)
+
+    tm.gauge("clusters.count", len(set(final_labels)))
+
+    # --------------- Output DF ---------------
+    labels_len = len(final_labels)
+    try:
+        df_raw = pd.read_csv(RAWFILE)
+    except FileNotFoundError:
+        df_raw = pd.DataFrame()
+
+    common_n = min(labels_len, len(df_raw))
+
+    if common_n > 0:
+        df_out = df_raw.iloc[:common_n].copy()
+        df_out["cluster"] = final_labels[:common_n]
+    else:
+        df_out = pd.DataFrame({"cluster": final_labels})
+
+    df_out.to_csv(OUTFILE, index=False)
+    print(f"Saved {OUTFILE} with {len(df_out)} rows")
+    print(f"Saved {MODEL}")
 
-if common_n > 0:
-    df_out = df_raw.iloc[:common_n].copy()
-    df_out["cluster"] = final_labels[:common_n]
-else:
-    df_out = pd.DataFrame({"cluster": final_labels})
 
-df_out.to_csv(OUTFILE, index=False)
-print(f"Saved {OUTFILE} with {len(df_out)} rows")
\ No newline at end of file
+if __name__ == "__main__":
+    main()
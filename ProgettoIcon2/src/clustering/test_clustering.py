@@ -0,0 +1,33 @@
+"""Drift di ``assign``: la crescita si accumula fra un fit e l'altro."""
+import numpy as np
+
+from clustering import assign, fit, GROWTH_MAX
+
+
+def _bundle(n=200, seed=0):
+    rng = np.random.default_rng(seed)
+    centers = np.array([[0, 0], [10, 10], [0, 10]])
+    X = centers[rng.integers(0, 3, n)] + rng.normal(0, 0.5, (n, 2))
+    bundle = fit(X, "kmeans", 3, 3)
+    bundle.pop("labels")
+    return bundle, centers, rng
+
+
+def test_small_batches_accumulate_growth():
+    bundle, centers, rng = _bundle()
+    n_known, step = bundle["n_fit"], 20                 # lotti del 10%: nessuno supera da solo GROWTH_MAX
+    drifts = []
+    for _ in range(4):
+        X = centers[rng.integers(0, 3, step)] + rng.normal(0, 0.5, (step, 2))
+        _, diag = assign(bundle, X, n_known=n_known)
+        drifts.append(diag["drift"])
+        n_known += step
+    assert drifts == [False, False, True, True]
+    assert np.isclose(diag["growth"], 4 * step / bundle["n_fit"])
+
+
+def test_default_counts_only_the_fit():
+    bundle, centers, rng = _bundle()
+    n = int(bundle["n_fit"] * GROWTH_MAX) + 1
+    _, diag = assign(bundle, centers[rng.integers(0, 3, n)])
+    assert diag["drift"] and diag["outlier_frac"] == 0
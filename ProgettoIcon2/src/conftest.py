@@ -0,0 +1,51 @@
+"""Configurazione pytest: i moduli di src/ si importano come fanno gli script
+(cartella del modulo e src/ nel sys.path).
+
+Fixture comuni:
+    make_city(n, seed, …) → (poi, D, uri2idx) di una città sintetica
+    city                  → make_city() con i valori di default, su più seed
+"""
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+
+SRC = Path(__file__).resolve().parent
+for p in [SRC, *(d for d in SRC.iterdir() if d.is_dir() and not d.name.startswith((".", "_")))]:
+    if str(p) not in sys.path:
+        sys.path.insert(0, str(p))
+
+TYPES = ["Museum", "Park", "Church", "HistoricBuilding"]
+SEEDS = [0, 1]
+
+
+def synthetic_city(n: int = 16, seed: int = 0, span: float = 2000.0, n_types: int = 3,
+                   n_clusters: int = 1, users=("bob",), asym: float = 0.0):
+    """POI sempre aperti su un quadrato di lato ``span`` metri; D = distanza
+    euclidea in secondi (1 m/s), moltiplicata per un rumore ``1 ± asym`` non
+    simmetrico se ``asym > 0``. ``users`` aggiunge le colonne ``score_<user>``."""
+    rng = np.random.default_rng(seed)
+    poi = pd.DataFrame({"uri": [f"u{i}" for i in range(n)], "label": [f"P{i}" for i in range(n)],
+                        "type": [TYPES[i % n_types] for i in range(n)],
+                        "score": rng.uniform(0.1, 1.0, n).round(3),
+                        "cluster": rng.integers(0, n_clusters, n),
+                        "open": "00:00", "close": "24:00"})
+    for u in users:
+        poi[f"score_{u}"] = rng.uniform(0.1, 1.0, n).round(3)
+    xy = rng.uniform(0, span, (n, 2))
+    D = np.linalg.norm(xy[:, None] - xy[None], axis=-1)
+    if asym:
+        D = D * rng.uniform(1 - asym, 1 + asym, D.shape)
+    return poi, D.astype("float32"), dict(zip(poi["uri"], range(n)))
+
+
+@pytest.fixture
+def make_city():
+    return synthetic_city
+
+
+@pytest.fixture(params=SEEDS, ids=lambda s: f"seed{s}")
+def city(request):
+    return synthetic_city(seed=request.param)
@@ -1,3 +1,4 @@
+import os
 import sys
 import re
 import time
@@ -6,6 +7,9 @@ import pandas as pd
 import requests
 from tqdm import tqdm
 
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from telemetria import telemetry as tm, net
+
 # ------------------------------- CONFIG ------------------------------------
 # Definiamo la cartella data/ alla radice del progetto
 base = Path.cwd() / "data"
@@ -21,6 +25,11 @@ OUTFILE = base / f"poi_{city_lower}_hours.csv"
 # Orari di fallback
 FALLBACK_OPEN, FALLBACK_CLOSE = "09:00", "18:00"
 
+# Endpoint REST di Wikipedia e pausa fra richieste (sovrascrivibili da ambiente,
+# es. per il finto server del benchmark)
+WIKI_URL = os.environ.get("SMARTTOUR_WIKI_URL", "https://it.wikipedia.org/api/rest_v1/page/html/")
+PAUSE_S  = float(os.environ.get("SMARTTOUR_HTTP_PAUSE", "0.3"))
+
 # Header personalizzato per le richieste HTTP   
 HEADERS = {"User-Agent": "SmartTour-CSP/1.0 (stefano@studenti.uniba.it)"}
 # ---------------------------------------------------------------------------
@@ -37,25 +46,30 @@ def guess_hours_from_infobox(html: str):
         open_time  = m.group(1).replace(".", ":")
         close_time = m.group(2).replace(".", ":")
         return open_time, close_time
+    tm.incr("wiki.fallback", reason="no_hours")
     return FALLBACK_OPEN, FALLBACK_CLOSE
 
 def fetch_hours(title: str):
     """
     Richiama l'endpoint REST di Wikipedia per la pagina 'title',
     prende il codice HTML e ne estrae gli orari tramite regex.
+    429/5xx ed errori di rete si ritentano con backoff (telemetria/net.py).
     """
-    url = f"https://it.wikipedia.org/api/rest_v1/page/html/{title}"
+    url = f"{WIKI_URL}{title}"
     try:
-        r = requests.get(url, headers=HEADERS, timeout=8)
-        if r.status_code == 404:
-            # Pagina non trovata: fallback
-            return FALLBACK_OPEN, FALLBACK_CLOSE
-        return guess_hours_from_infobox(r.text)
+        r = net.get(url, "wikipedia", headers=HEADERS, timeout=8)
     except requests.exceptions.RequestException:
-        # Errori di rete o timeout: fallback
+        # Errori di rete, timeout o 5xx anche dopo i retry: fallback
+        tm.incr("wiki.fallback", reason="network")
         return FALLBACK_OPEN, FALLBACK_CLOSE
+    if r.status_code == 404:
+        # Pagina non trovata: fallback
+        tm.incr("wiki.fallback", reason="not_found")
+        return FALLBACK_OPEN, FALLBACK_CLOSE
+    return guess_hours_from_infobox(r.text)
 
 def main():
+    tm.setup("enrich_hours")
     # Controllo che il file di input esista
     if not INFILE.exists():
         print(f"❌ File non trovato: {INFILE}")
@@ -75,7 +89,9 @@ def main():
         opens.append(open_h)
         closes.append(close_h)
         # Pausa per non sovraccaricare l'API
-        time.sleep(0.3)
+        time.sleep(PAUSE_S)
+
+    tm.gauge("poi.count", total)
 
     # Aggiungiamo le colonne al DataFrame
     df["open"]  = opens
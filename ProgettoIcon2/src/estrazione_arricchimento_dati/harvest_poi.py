@@ -7,13 +7,16 @@ Esempio d'uso:
 from __future__ import annotations
 
 from pathlib import Path
-import sys, argparse, textwrap, logging
+import sys, os, argparse, textwrap, logging
 from typing import Tuple
 
 from SPARQLWrapper import SPARQLWrapper, JSON
 import pandas as pd
 import requests
 
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from telemetria import telemetry as tm, net
+
 try:
     from geopy.geocoders import Nominatim
 except ImportError:  # fallback neutro
@@ -50,6 +53,7 @@ LOCAL_PROPS = ["dbo:location", "dbo:city", "dbo:municipality", "dbo:isPartOf"]
 
 # ------------------------- Utility -----------------------------------------
 HEADERS = {"User-Agent": "SmartTour-CSP/1.0 (harvester)"}
+SPARQL_URL = os.environ.get("SMARTTOUR_SPARQL_URL", "https://dbpedia.org/sparql")
 
 
 def get_bbox(city: str, delta_deg: float) -> Tuple[float, float, float, float]:
@@ -103,17 +107,19 @@ def build_query() -> str:
 # ------------------------- Main --------------------------------------------
 
 def run_sparql(query: str):
-    sparql = SPARQLWrapper("https://dbpedia.org/sparql")
+    sparql = SPARQLWrapper(SPARQL_URL)
     sparql.setQuery(query)
     sparql.setReturnFormat(JSON)
     try:
-        return sparql.query().convert()
+        # 429/5xx ed errori di rete si ritentano con backoff (telemetria/net.py)
+        return net.call(lambda: sparql.query().convert(), "sparql", net.urllib_status)
     except Exception as exc:
         log.error("Errore SPARQL: %s", exc)
         sys.exit(1)
 
 
 def main():
+    tm.setup("harvest_poi")
     log.info("Scarico POI per %s (lang=%s)…", CITY, LANG)
     query = build_query()
     raw = run_sparql(query)
@@ -132,6 +138,8 @@ def main():
         for b in bindings
     ]
     df = pd.DataFrame(rows).drop_duplicates(subset="uri").reset_index(drop=True)
+    tm.gauge("sparql.bindings", len(bindings))
+    tm.gauge("poi.count", len(df))
 
     outdir = Path.cwd() / "data"
     outdir.mkdir(exist_ok=True)
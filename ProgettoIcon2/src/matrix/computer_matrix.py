@@ -3,16 +3,23 @@
 
 • legge poi_<city>_cluster.csv
 • chiama OSRM profilo foot (async se aiohttp presente)
+  oppure, con --backend local, calcola i tempi offline su un grafo stradale
+  OSM/GraphML (local_router.py: CSR + Dijkstra multi-sorgente parallelo)
 • sostituisce gli archi mancanti (np.inf) con una stima Haversine a 5 km/h
 • salva distance_matrix_<city>.npy   (float32, senza inf)
+  + distance_matrix_<city>.meta.json (URI in ordine di riga, vedi matrix_store.py)
 """
 from __future__ import annotations
 
-import argparse, asyncio, time, sys
+import argparse, asyncio, sys, os
 from pathlib import Path
 import numpy as np
 import pandas as pd
-import requests, math
+import math
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from telemetria import telemetry as tm, net
+from matrix.matrix_store import save_matrix
 
 try:
     import aiohttp, async_timeout
@@ -20,22 +27,11 @@ try:
 except ImportError:
     ASYNC=False
 
-OSRM_URL="https://router.project-osrm.org/table/v1/{profile}/"
-MAX_BATCH=100
+# SMARTTOUR_OSRM_URL permette di puntare a un OSRM locale (o al finto server del benchmark)
+OSRM_URL=os.environ.get("SMARTTOUR_OSRM_URL","https://router.project-osrm.org")+"/table/v1/{profile}/"
+MAX_BATCH=100        # ogni tile ritenta 429/5xx/errori di rete (telemetria/net.py)
 HEADERS={"User-Agent":"SmartTour-Matrix/2.0"}
 
-# ─── CLI ───────────────────────────────────────────────────────────
-par=argparse.ArgumentParser(description="Genera matrice tempi fra POI")
-par.add_argument("city")
-par.add_argument("--profile",choices=["foot","bike","car"],default="foot")
-par.add_argument("--rebuild",action="store_true")
-args=par.parse_args(); CITY=args.city.lower(); PROF=args.profile
-
-CSV=Path(f"data/poi_{CITY}_cluster.csv"); NPY=Path(f"data/distance_matrix_{CITY}.npy")
-if not CSV.exists(): sys.exit("💥  Prima esegui clustering")
-if NPY.exists() and not args.rebuild:
-    print("✅  Matrice già presente – usa --rebuild per rigenerare"); sys.exit(0)
-
 # ─── util ──────────────────────────────────────────────────────────
 chunk=lambda it,s: (it[i:i+s] for i in range(0,len(it),s))
 coords2str=lambda c: ";".join(f"{lon},{lat}" for lat,lon in c)
@@ -48,35 +44,49 @@ def haversine_km(lat1,lon1,lat2,lon2):
     return 2*R*math.asin(math.sqrt(a))
 
 # ─── fetch helpers ────────────────────────────────────────────────
+def aio_status(exc):
+    if isinstance(exc,RuntimeError): return exc.args[0]          # status HTTP ≠ 200
+    if isinstance(exc,(aiohttp.ClientError,asyncio.TimeoutError)): return None
+    return net.NOT_RETRYABLE
+
 async def fetch(session,url):
     from async_timeout import timeout
-    async with timeout(60):
-        async with session.get(url,headers=HEADERS) as r:
-            if r.status!=200: raise RuntimeError(r.status)
-            return await r.json()
+    async def once():
+        async with timeout(60):
+            async with session.get(url,headers=HEADERS) as r:
+                tm.incr("http.requests",endpoint="osrm",status=r.status)
+                if r.status!=200: raise RuntimeError(r.status)
+                return await r.json()
+    return await net.acall(once,"osrm",aio_status)
+
+def get_sync(url):
+    r=net.get(url,"osrm",headers=HEADERS,timeout=60)
+    r.raise_for_status()                                          # 4xx non ritentabili
+    return r.json()
 
-aSync=lambda crd: asyncio.run(build_async(crd)) if ASYNC else build_sync(crd)
+aSync=lambda crd,prof: asyncio.run(build_async(crd,prof)) if ASYNC else build_sync(crd,prof)
 
-def build_sync(crd):
+def build_sync(crd,prof):
     N=len(crd); M=np.full((N,N),np.inf,float)
     for batch in chunk(list(range(N)),MAX_BATCH):
         subset=[crd[i] for i in batch]
-        url=OSRM_URL.format(profile=PROF)+coords2str(subset)
-        r=requests.get(url,headers=HEADERS,timeout=60); r.raise_for_status()
-        dur=r.json()["durations"]
+        url=OSRM_URL.format(profile=prof)+coords2str(subset)
+        dur=get_sync(url)["durations"]
+        tm.incr("osrm.tiles")
         for i, row in enumerate(dur):
             for j,val in enumerate(row):
                 if val is not None: M[batch[i],batch[j]]=val
     return M
 
-async def build_async(crd):
+async def build_async(crd,prof):
     N=len(crd); M=np.full((N,N),np.inf,float); tasks=[]
     async with aiohttp.ClientSession() as sess:
         for batch in chunk(list(range(N)),MAX_BATCH):
             subset=[crd[i] for i in batch]
-            url=OSRM_URL.format(profile=PROF)+coords2str(subset)
+            url=OSRM_URL.format(profile=prof)+coords2str(subset)
             tasks.append(fetch(sess,url))
         res=await asyncio.gather(*tasks)
+    tm.incr("osrm.tiles",len(res))
     base=0
     for part in res:
         for i,row in enumerate(part["durations"]):
@@ -86,20 +96,52 @@ async def build_async(crd):
     return M
 
 # ─── main ─────────────────────────────────────────────────────────
-print(f"🔄  Carico {CSV} …")
-df=pd.read_csv(CSV); coords=list(zip(df.lat,df.lon)); N=len(coords)
-print(f"→ {N} POI – costruzione matrice {N}×{N} con profilo {PROF} …")
-mat=aSync(coords)
-
-# ─── fallback per archi inf ───────────────────────────────────────
-mask=np.isinf(mat)
-if mask.any():
-    print(f"ℹ️  {mask.sum()} archi mancanti – uso fallback Haversine 5 km/h")
-    lat=df.lat.to_numpy(); lon=df.lon.to_numpy()
-    i_idx,j_idx=np.where(mask)
-    for i,j in zip(i_idx,j_idx):
-        dist_km=haversine_km(lat[i],lon[i],lat[j],lon[j])
-        mat[i,j]=(dist_km*1000)/1.388  # sec @5 km/h
-
-np.save(NPY,mat.astype("float32"))
-print(f"✅  Salvato {NPY}  (shape {mat.shape}, inf rimasti {np.isinf(mat).sum()})")
\ No newline at end of file
+# (dietro __main__: con lo start method spawn i worker di local_router
+#  re-importano questo modulo)
+def main():
+    # ─── CLI ───────────────────────────────────────────────────────
+    par=argparse.ArgumentParser(description="Genera matrice tempi fra POI")
+    par.add_argument("city")
+    par.add_argument("--profile",choices=["foot","bike","car"],default="foot")
+    par.add_argument("--rebuild",action="store_true")
+    par.add_argument("--backend",choices=["osrm","local"],default="osrm")
+    par.add_argument("--graph",type=Path,help="Estratto .osm o .graphml per --backend local")
+    par.add_argument("--workers",type=int,default=None,help="Processi Dijkstra (default: tutti i core)")
+    args=par.parse_args(); CITY=args.city.lower(); PROF=args.profile
+    tm.setup("computer_matrix")
+
+    CSV=Path(f"data/poi_{CITY}_cluster.csv"); NPY=Path(f"data/distance_matrix_{CITY}.npy")
+    if not CSV.exists(): sys.exit("💥  Prima esegui clustering")
+    if args.backend=="local" and (args.graph is None or not args.graph.exists()):
+        sys.exit("💥  --backend local richiede --graph <file .osm/.graphml>")
+    if NPY.exists() and not args.rebuild:
+        print("✅  Matrice già presente – usa --rebuild per rigenerare"); return
+
+    print(f"🔄  Carico {CSV} …")
+    df=pd.read_csv(CSV); coords=list(zip(df.lat,df.lon)); N=len(coords)
+    print(f"→ {N} POI – costruzione matrice {N}×{N} con profilo {PROF} ({args.backend}) …")
+    with tm.timer("matrix.build_s",backend=args.backend):
+        if args.backend=="local":
+            from matrix.local_router import build_local
+            mat=build_local(args.graph,df.lat.to_numpy(),df.lon.to_numpy(),PROF,args.workers)
+        else:
+            mat=aSync(coords,PROF)
+    tm.gauge("matrix.n",N)
+
+    # ─── fallback per archi inf ───────────────────────────────────────
+    mask=np.isinf(mat)
+    if mask.any():
+        print(f"ℹ️  {mask.sum()} archi mancanti – uso fallback Haversine 5 km/h")
+        lat=df.lat.to_numpy(); lon=df.lon.to_numpy()
+        tm.gauge("matrix.fallback_edges",int(mask.sum()))
+        i_idx,j_idx=np.where(mask)
+        for i,j in zip(i_idx,j_idx):
+            dist_km=haversine_km(lat[i],lon[i],lat[j],lon[j])
+            mat[i,j]=(dist_km*1000)/1.388  # sec @5 km/h
+
+    save_matrix(NPY,mat.astype("float32"),df.uri)
+    print(f"✅  Salvato {NPY}  (shape {mat.shape}, inf rimasti {np.isinf(mat).sum()})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,136 @@
+"""Backend di routing locale per computer_matrix.py (nessuna chiamata di rete).
+
+• carica un estratto OSM (.osm/.xml, via osmnx) o un GraphML (osmnx o networkx)
+• lo converte in un grafo CSR compatto (scipy.sparse) con pesi in secondi
+• aggancia ogni POI al nodo più vicino (KD-tree su coordinate proiettate)
+• calcola la matrice con Dijkstra multi-sorgente (scipy.sparse.csgraph),
+  sorgenti divise a blocchi su più processi
+
+Il tratto POI→nodo agganciato è sempre aggiunto a piedi (5 km/h).
+Le coppie non raggiungibili restano ``np.inf`` (le gestisce il fallback
+Haversine di computer_matrix.py).
+"""
+from __future__ import annotations
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+import numpy as np
+from scipy.sparse import csr_matrix
+from scipy.sparse.csgraph import dijkstra
+from scipy.spatial import cKDTree
+
+try:
+    import osmnx
+except ImportError:
+    osmnx = None
+
+SPEED_MS = {"foot": 1.388, "bike": 4.2, "car": 11.1}    # m/s (5 / 15 / 40 km/h)
+EARTH_R  = 6371000.0
+
+_GRAPH = None        # CSR condiviso nei worker
+
+
+# ---------- caricamento ----------
+def load_graph(path: Path):
+    """Restituisce un grafo networkx con nodi ``x``=lon, ``y``=lat e archi ``length`` (m)."""
+    path = Path(path)
+    if path.suffix == ".graphml":
+        if osmnx is not None:
+            return osmnx.load_graphml(path)
+        import networkx as nx
+        return nx.read_graphml(path)
+    if path.suffix in {".osm", ".xml"} or path.name.endswith((".osm.bz2", ".xml.bz2")):
+        if osmnx is None:
+            raise SystemExit("💥  Per leggere estratti .osm serve osmnx (pip install osmnx)")
+        return osmnx.graph_from_xml(path, simplify=True, retain_all=False)
+    raise SystemExit(f"💥  Formato grafo non supportato: {path.name} (usa .graphml o .osm)")
+
+
+def _project(lat: np.ndarray, lon: np.ndarray, lat0: float) -> np.ndarray:
+    """Equirettangolare in metri: sufficiente su scala urbana per lo snap."""
+    return np.c_[np.radians(lon) * np.cos(np.radians(lat0)) * EARTH_R, np.radians(lat) * EARTH_R]
+
+
+def to_csr(G, speed_ms: float, undirected: bool = True):
+    """Grafo → (csr dei tempi in secondi, coordinate lat/lon dei nodi)."""
+    nodes = list(G.nodes)
+    pos = {n: i for i, n in enumerate(nodes)}
+    lat = np.array([float(G.nodes[n]["y"]) for n in nodes])
+    lon = np.array([float(G.nodes[n]["x"]) for n in nodes])
+    xy = _project(lat, lon, lat.mean())
+
+    src, dst, length = [], [], []
+    for u, v, data in G.edges(data=True):
+        a, b = pos[u], pos[v]
+        if a == b:
+            continue
+        L = data.get("length")
+        L = float(L) if L is not None else float(np.hypot(*(xy[a] - xy[b])))
+        src.append(a); dst.append(b); length.append(L)
+    src, dst, w = np.array(src), np.array(dst), np.array(length) / speed_ms
+    if undirected:                                  # a piedi i sensi unici non contano
+        src, dst, w = np.r_[src, dst], np.r_[dst, src], np.r_[w, w]
+
+    # archi paralleli: tiene il più breve (csr_matrix sommerebbe i duplicati)
+    order = np.lexsort((w, dst, src))
+    src, dst, w = src[order], dst[order], w[order]
+    first = np.r_[True, (src[1:] != src[:-1]) | (dst[1:] != dst[:-1])]
+    n = len(nodes)
+    csr = csr_matrix((w[first], (src[first], dst[first])), shape=(n, n))
+    return csr, lat, lon
+
+
+def snap(lat_n, lon_n, lat_p, lon_p):
+    """Nodo più vicino per ogni POI e distanza (m) di aggancio."""
+    lat0 = lat_n.mean()
+    tree = cKDTree(_project(lat_n, lon_n, lat0))
+    dist, idx = tree.query(_project(lat_p, lon_p, lat0))
+    return idx, dist
+
+
+# ---------- Dijkstra parallelo ----------
+def _init_worker(csr):
+    global _GRAPH
+    _GRAPH = csr
+
+
+def _rows(task):
+    sources, targets = task
+    return dijkstra(_GRAPH, directed=True, indices=sources)[:, targets].astype(np.float32)
+
+
+def travel_matrix(csr, node_idx: np.ndarray, offset_s: np.ndarray,
+                  workers: int | None = None, chunk: int | None = None) -> np.ndarray:
+    """Matrice N×N dei tempi (s) fra i nodi agganciati, più i tratti di aggancio."""
+    uniq, inv = np.unique(node_idx, return_inverse=True)
+    n_nodes = csr.shape[0]
+    workers = workers or os.cpu_count() or 1
+    # almeno un blocco per worker, al più ~20M celle ciascuno (dijkstra restituisce
+    # float64: ≈160 MB per blocco, prima del taglio sulle sole colonne dei POI)
+    chunk = chunk or max(1, min(-(-len(uniq) // workers), int(2e7 // max(1, n_nodes))))
+    tasks = [(uniq[i:i + chunk], uniq) for i in range(0, len(uniq), chunk)]
+
+    if workers == 1 or len(tasks) == 1:
+        _init_worker(csr)
+        parts = list(map(_rows, tasks))
+    else:
+        with ProcessPoolExecutor(min(workers, len(tasks)), initializer=_init_worker,
+                                 initargs=(csr,)) as ex:
+            parts = list(ex.map(_rows, tasks))
+    U = np.vstack(parts)                            # |uniq| × |uniq|
+
+    off = offset_s.astype(np.float32)
+    M = U[np.ix_(inv, inv)] + off[:, None] + off[None, :]
+    np.fill_diagonal(M, 0.0)
+    return M
+
+
+def build_local(graph_file: Path, lat_p, lon_p, profile: str = "foot",
+                workers: int | None = None) -> np.ndarray:
+    """Pipeline completa: grafo → CSR → snap → matrice (secondi, inf se irraggiungibile)."""
+    speed = SPEED_MS[profile]
+    G = load_graph(graph_file)
+    csr, lat_n, lon_n = to_csr(G, speed, undirected=(profile == "foot"))
+    node_idx, snap_m = snap(lat_n, lon_n, np.asarray(lat_p, float), np.asarray(lon_p, float))
+    return travel_matrix(csr, node_idx, snap_m / SPEED_MS["foot"], workers=workers)
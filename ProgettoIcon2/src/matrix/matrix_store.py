@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+"""Accesso condiviso alla matrice dei tempi fra processi.
+
+Due modi per non duplicare la matrice N×N in ogni worker:
+
+• ``load_matrix(path)`` – ``np.load(mmap_mode="r")``: nessuna lettura né copia
+  all'apertura, le pagine del file restano nella page cache e sono condivise
+  da tutti i processi che lo mappano.
+• ``publish(...)`` / ``attach(handle)`` – registro su
+  ``multiprocessing.shared_memory``: il processo padre copia la matrice una
+  volta sola, i worker si agganciano per nome (utile se il file non è su
+  disco locale o se la matrice è calcolata al volo).
+
+Accanto a ``distance_matrix_<city>.npy`` si salva
+``distance_matrix_<city>.meta.json`` (shape, dtype, URI in ordine di riga) così
+la mappa URI→indice non dipende più dall'ordine di poi_<city>_cluster.csv.
+
+Esempio (rigenera i metadati di una matrice esistente):
+    python src/matrix/matrix_store.py Rome
+"""
+from __future__ import annotations
+
+import argparse, atexit, json, multiprocessing, os, sys
+from multiprocessing import shared_memory
+from pathlib import Path
+import numpy as np
+import pandas as pd
+
+_OWNED: dict[str, shared_memory.SharedMemory] = {}     # segmenti creati da questo processo
+_OWNER_PID = os.getpid()                               # i figli (fork) non devono rimuoverli
+_ATTACHED: dict[str, shared_memory.SharedMemory] = {}  # segmenti agganciati
+
+
+# ---------- file + metadati ----------
+def meta_path(npy: Path) -> Path:
+    return Path(npy).with_suffix(".meta.json")
+
+
+def write_meta(npy: Path, mat: np.ndarray, uris) -> None:
+    uris = list(uris)
+    if len(uris) != mat.shape[0]:
+        raise ValueError(f"{len(uris)} URI ma matrice {mat.shape}")
+    meta = dict(shape=list(mat.shape), dtype=str(mat.dtype), uris=uris)
+    meta_path(npy).write_text(json.dumps(meta, ensure_ascii=False), encoding="utf-8")
+
+
+def save_matrix(npy: Path, mat: np.ndarray, uris) -> None:
+    """Salva la matrice e il sidecar con gli URI in ordine di riga."""
+    np.save(npy, mat)
+    write_meta(npy, mat, uris)
+
+
+def load_matrix(npy: Path, mmap: bool = True) -> np.ndarray:
+    """Matrice in sola lettura mappata in memoria (``mmap=False`` → copia privata)."""
+    return np.load(npy, mmap_mode="r" if mmap else None)
+
+
+def load_index(npy: Path, cluster_csv: Path | None = None) -> dict[str, int]:
+    """URI→indice di riga: dal sidecar se c'è, altrimenti dall'ordine del CSV cluster."""
+    meta = meta_path(npy)
+    if meta.exists():
+        uris = json.loads(meta.read_text(encoding="utf-8"))["uris"]
+    elif cluster_csv is not None and Path(cluster_csv).exists():
+        uris = pd.read_csv(cluster_csv, usecols=["uri"])["uri"].tolist()
+    else:
+        raise FileNotFoundError(f"Nessun indice URI per {npy}")
+    return {u: i for i, u in enumerate(uris)}
+
+
+# ---------- registro shared memory ----------
+def publish(src, name: str | None = None) -> dict:
+    """Copia (una volta) la matrice in un segmento condiviso; restituisce l'handle."""
+    arr = load_matrix(src) if isinstance(src, (str, Path)) else np.asarray(src)
+    shm = shared_memory.SharedMemory(create=True, size=max(1, arr.nbytes), name=name)
+    view = np.ndarray(arr.shape, dtype=arr.dtype, buffer=shm.buf)
+    view[...] = arr
+    _OWNED[shm.name] = shm
+    return dict(name=shm.name, shape=list(arr.shape), dtype=str(arr.dtype))
+
+
+def attach(handle: dict) -> np.ndarray:
+    """Vista NumPy (sola lettura) su un segmento pubblicato da ``publish``."""
+    name = handle["name"]
+    shm = _OWNED.get(name, _ATTACHED.get(name))
+    if shm is None:
+        shm = _open_untracked(name)
+        _ATTACHED[name] = shm
+    view = np.ndarray(tuple(handle["shape"]), dtype=handle["dtype"], buffer=shm.buf)
+    view.flags.writeable = False
+    return view
+
+
+def _open_untracked(name: str) -> shared_memory.SharedMemory:
+    """Aggancio senza che il resource_tracker rimuova il segmento all'uscita
+    del processo che si aggancia."""
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)     # Python ≥ 3.13
+    except TypeError:
+        shm = shared_memory.SharedMemory(name=name)
+        # I figli di multiprocessing (fork o spawn) condividono il tracker del
+        # padre: la registrazione è un doppione innocuo e toglierla cancellerebbe
+        # quella del padre. Solo un processo indipendente ha un tracker proprio.
+        if multiprocessing.parent_process() is None:
+            from multiprocessing import resource_tracker
+            resource_tracker.unregister(shm._name, "shared_memory")
+        return shm
+
+
+def release(handle: dict | None = None) -> None:
+    """Libera un segmento (o tutti) creato da questo processo."""
+    if os.getpid() != _OWNER_PID:
+        return
+    names = [handle["name"]] if handle else list(_OWNED)
+    for n in names:
+        shm = _OWNED.pop(n, None)
+        if shm is not None:
+            shm.close()
+            shm.unlink()
+
+
+def open_shared(src) -> np.ndarray:
+    """Risolve una "sorgente" di matrice: path (.npy → mmap), handle shm o array."""
+    if isinstance(src, (str, Path)):
+        return load_matrix(src)
+    if isinstance(src, dict):
+        return attach(src)
+    return src
+
+
+atexit.register(release)
+
+
+def main():
+    par = argparse.ArgumentParser(description="Scrive il sidecar URI→indice della matrice")
+    par.add_argument("city")
+    args = par.parse_args()
+    city = args.city.lower()
+    npy = Path(f"data/distance_matrix_{city}.npy")
+    csv = Path(f"data/poi_{city}_cluster.csv")
+    if not npy.exists() or not csv.exists():
+        sys.exit("💥  Servono distance_matrix_<city>.npy e poi_<city>_cluster.csv")
+    try:
+        write_meta(npy, load_matrix(npy), pd.read_csv(csv, usecols=["uri"])["uri"])
+    except ValueError as exc:
+        sys.exit(f"💥  {exc}")
+    print(f"✅  Metadati salvati → {meta_path(npy)}")
+
+
+if __name__ == "__main__":
+    main()
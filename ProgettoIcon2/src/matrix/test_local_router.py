@@ -0,0 +1,91 @@
+"""Backend locale: snap KD-tree e Dijkstra a blocchi contro il calcolo diretto."""
+import numpy as np
+import pytest
+from scipy.sparse.csgraph import dijkstra
+
+import local_router as lr
+
+nx = pytest.importorskip("networkx")
+
+
+def _grid(n=7, seed=0):
+    """Griglia n×n (~100 m) attorno a Roma, con un arco parallelo più lungo e
+    qualche arco rimosso."""
+    rng = np.random.default_rng(seed)
+    G = nx.MultiDiGraph()
+    for i in range(n):
+        for j in range(n):
+            G.add_node(i * n + j, y=41.9 + i * 9e-4 + rng.normal(0, 1e-5),
+                       x=12.5 + j * 1.2e-3 + rng.normal(0, 1e-5))
+    for i in range(n):
+        for j in range(n):
+            u = i * n + j
+            if j + 1 < n:
+                G.add_edge(u, u + 1, length=float(rng.uniform(90, 130)))
+            if i + 1 < n and rng.random() > 0.2:
+                G.add_edge(u, u + n, length=float(rng.uniform(90, 130)))
+    G.add_edge(0, 1, length=1e4)                 # parallelo: deve vincere il più breve
+    return G
+
+
+def _pois(G, k=15, seed=1):
+    rng = np.random.default_rng(seed)
+    lat = np.array([G.nodes[n]["y"] for n in G.nodes])
+    lon = np.array([G.nodes[n]["x"] for n in G.nodes])
+    return (rng.uniform(lat.min(), lat.max(), k), rng.uniform(lon.min(), lon.max(), k))
+
+
+def test_snap_is_nearest_node():
+    G = _grid()
+    csr, lat_n, lon_n = lr.to_csr(G, lr.SPEED_MS["foot"])
+    lat_p, lon_p = _pois(G)
+    idx, dist = lr.snap(lat_n, lon_n, lat_p, lon_p)
+    P = lr._project(lat_n, lon_n, lat_n.mean())
+    Q = lr._project(lat_p, lon_p, lat_n.mean())
+    brute = np.linalg.norm(Q[:, None] - P[None], axis=-1)
+    assert (idx == brute.argmin(axis=1)).all()
+    assert np.allclose(dist, brute.min(axis=1))
+
+
+def test_parallel_edges_keep_shortest():
+    csr, _, _ = lr.to_csr(_grid(), 1.0)
+    assert csr[0, 1] < 200 and csr[1, 0] == csr[0, 1]
+
+
+@pytest.mark.parametrize("chunk", [None, 1, 4])
+def test_matrix_matches_direct_dijkstra(chunk):
+    G = _grid()
+    csr, lat_n, lon_n = lr.to_csr(G, lr.SPEED_MS["foot"])
+    lat_p, lon_p = _pois(G)
+    idx, dist = lr.snap(lat_n, lon_n, lat_p, lon_p)
+    off = dist / lr.SPEED_MS["foot"]
+    M = lr.travel_matrix(csr, idx, off, workers=1, chunk=chunk)
+
+    full = dijkstra(csr, directed=True)
+    ref = full[np.ix_(idx, idx)] + off[:, None] + off[None, :]
+    np.fill_diagonal(ref, 0.0)
+    assert M.shape == (len(idx), len(idx))
+    assert np.allclose(M, ref, rtol=1e-5)
+
+
+def test_workers_give_identical_matrices():
+    G = _grid(9)
+    csr, lat_n, lon_n = lr.to_csr(G, lr.SPEED_MS["foot"], undirected=False)
+    lat_p, lon_p = _pois(G, 25)
+    idx, dist = lr.snap(lat_n, lon_n, lat_p, lon_p)
+    off = dist / lr.SPEED_MS["foot"]
+    one = lr.travel_matrix(csr, idx, off, workers=1, chunk=3)
+    many = lr.travel_matrix(csr, idx, off, workers=3, chunk=3)
+    assert np.isinf(one).any()                   # grafo orientato: coppie irraggiungibili
+    np.testing.assert_array_equal(one, many)
+
+
+def test_build_local_from_graphml(tmp_path):
+    G = _grid()
+    f = tmp_path / "grid.graphml"
+    nx.write_graphml(G, f)
+    lat_p, lon_p = _pois(G)
+    M = lr.build_local(f, lat_p, lon_p, "foot", workers=1)
+    csr, lat_n, lon_n = lr.to_csr(G, lr.SPEED_MS["foot"])
+    idx, dist = lr.snap(lat_n, lon_n, lat_p, lon_p)
+    assert np.allclose(M, lr.travel_matrix(csr, idx, dist / lr.SPEED_MS["foot"], workers=1))
@@ -0,0 +1,40 @@
+"""Registro shared memory di matrix_store.py con start method fork e spawn."""
+import subprocess, sys, textwrap
+from pathlib import Path
+
+import pytest
+
+SRC = Path(__file__).resolve().parents[1]
+
+SCRIPT = textwrap.dedent("""
+    import multiprocessing as mp, sys
+    from concurrent.futures import ProcessPoolExecutor
+    import numpy as np
+    sys.path.insert(0, {src!r})
+    from matrix.matrix_store import publish, release, open_shared
+
+    def total(h):
+        return float(open_shared(h).sum())
+
+    if __name__ == "__main__":
+        D = np.arange(16, dtype=np.float32).reshape(4, 4)
+        h = publish(D)
+        with ProcessPoolExecutor(2, mp_context=mp.get_context({method!r})) as ex:
+            assert list(ex.map(total, [h] * 4)) == [120.0] * 4
+        assert open_shared(h).sum() == 120.0       # ancora valido dopo i worker
+        release(h)
+        print("ok")
+""")
+
+
+@pytest.mark.parametrize("method", ["fork", "spawn"])
+def test_workers_attach_without_breaking_tracker(tmp_path, method):
+    if method not in __import__("multiprocessing").get_all_start_methods():
+        pytest.skip(f"start method {method} non disponibile")
+    script = tmp_path / "run.py"
+    script.write_text(SCRIPT.format(src=str(SRC), method=method))
+    res = subprocess.run([sys.executable, str(script)], capture_output=True, text=True, timeout=120)
+    assert res.returncode == 0, res.stderr
+    assert res.stdout.strip() == "ok"
+    # né KeyError del resource_tracker né segmenti "leaked" alla chiusura
+    assert "KeyError" not in res.stderr and "leaked" not in res.stderr, res.stderr
@@ -4,7 +4,7 @@ Fix finale: gestiamo sia matrice sparse che ndarray.
 """
 from __future__ import annotations
 
-import argparse, random, sys
+import argparse, random, sys, time
 from pathlib import Path
 import joblib
 import numpy as np
@@ -12,6 +12,9 @@ import pandas as pd
 from sklearn.metrics import pairwise_distances_argmin_min
 from sklearn.ensemble import GradientBoostingRegressor
 
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from telemetria import telemetry as tm
+
 try:
     from pyproj import Transformer
 except ImportError:
@@ -22,6 +25,7 @@ parser.add_argument("city")
 parser.add_argument("--samples", type=int, default=10)
 args = parser.parse_args()
 city = args.city.lower(); K = args.samples
+tm.setup("learn_preferences")
 
 RAWFILE   = Path(f"data/poi_{city}.csv")
 PIPEFILE  = Path(f"data/pipeline_{city}.pkl")
@@ -43,13 +47,15 @@ else:
 df['open_sin'] = np.sin(theta); df['open_cos'] = np.cos(theta)
 
 pipe = joblib.load(PIPEFILE)
-X = pipe.transform(df)  # sparse or ndarray
+with tm.timer("pipeline.transform_s"):
+    X = pipe.transform(df)  # sparse or ndarray
 
 # helper to get dense rows
 get_row = (lambda m, i: m[i].toarray()[0]) if hasattr(X, 'toarray') else (lambda m, i: m[i])
 X_dense = X.toarray() if hasattr(X, 'toarray') else X
 
 # --- k-medoids sampling ---
+_t0 = time.perf_counter()
 random.seed(0)
 centroids_idx = [random.randrange(X.shape[0])]
 remaining = set(range(X.shape[0])) - set(centroids_idx)
@@ -58,6 +64,8 @@ while len(centroids_idx) < K:
     next_idx = list(remaining)[int(np.argmax(dist))]
     centroids_idx.append(next_idx); remaining.remove(next_idx)
 
+tm.observe("sampling.kmedoids_s", time.perf_counter() - _t0, k=K)
+
 print("\nDai un voto 1–5 ai seguenti luoghi:\n")
 X_train, y_train = [], []
 for idx in centroids_idx:
@@ -70,9 +78,12 @@ for idx in centroids_idx:
 X_train = np.vstack(X_train)
 
 model = GradientBoostingRegressor(random_state=0)
-model.fit(X_train, y_train)
+with tm.timer("model.fit_s"):
+    model.fit(X_train, y_train)
 
-scores = model.predict(X_dense)
+with tm.timer("model.predict_s"):
+    scores = model.predict(X_dense)
+tm.gauge("poi.count", len(df))
 scores_norm = ((np.clip(scores, 1, 5) - 1) / 4).round(3)
 
 df_out = df.copy(); df_out['score'] = scores_norm
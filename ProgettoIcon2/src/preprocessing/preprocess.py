@@ -5,9 +5,22 @@
    Uso:
        python preprocess.py Rome
 
+       python preprocess.py Rome --chunksize 100000     # cataloghi fuori memoria
+
    Crea:
        data/poi_<city>_prep.csv   (dati trasformati, solo per ispezione rapida)
        data/pipeline_<city>.pkl   (pipeline sklearn serializzata)
+       data/poi_<city>_prep.npy   (solo con --chunksize: matrice su disco, memmap)
+
+   Con ``--chunksize`` il CSV è letto a blocchi in due passate:
+     1. partial_fit dello scaler, vocabolario delle categorie, campione
+        reservoir (per le mediane dell'imputer)
+     2. trasformazione blocco per blocco verso il .npy in memmap e il CSV
+   La pipeline salvata è la stessa ColumnTransformer della modalità in memoria;
+   la memoria di picco dipende da chunksize e dalla dimensione del reservoir.
+
+   ``add_features`` è riusata da clustering.py per trasformare i POI nuovi
+   con la pipeline salvata.
 """
 from __future__ import annotations
 
@@ -17,85 +30,202 @@ import numpy as np
 import pandas as pd
 import joblib
 from pyproj import Transformer
+import sys
 
 from sklearn.compose import ColumnTransformer
 from sklearn.pipeline import Pipeline
 from sklearn.preprocessing import StandardScaler, OneHotEncoder
 from sklearn.impute import SimpleImputer
 
-# ----------------------------- CLI ------------------------------------------
-parser = argparse.ArgumentParser(description="Pre-processing del CSV dei POI per una data città")
-parser.add_argument("city", help="Nome città (es. Rome, Florence, Bari)")
-args = parser.parse_args()
-city = args.city.lower()
-
-# --------------------------- Percorsi file ----------------------------------
-RAW  = Path(f"data/poi_{city}.csv")
-PREP = Path(f"data/poi_{city}_prep.csv")
-PIPE = Path(f"data/pipeline_{city}.pkl")
-PREP.parent.mkdir(parents=True, exist_ok=True)
-
-# --------------------------- Lettura dati -----------------------------------
-if not RAW.exists():
-    raise FileNotFoundError(f"Non trovo il file {RAW}; hai eseguito harvest_poi.py?")
-
-df = pd.read_csv(RAW)
-
-# ----------------- Coordinate: lat/lon → metri, scaler ----------------------
-if {'lat', 'lon'}.issubset(df.columns):
-    transformer = Transformer.from_crs("EPSG:4326", "EPSG:32633", always_xy=True)
-    x_m, y_m = transformer.transform(df['lon'].to_numpy(), df['lat'].to_numpy())
-    df['x'] = x_m
-    df['y'] = y_m
-    df.drop(columns=['lat', 'lon'], inplace=True)
-else:
-    raise ValueError("Il CSV deve contenere colonne 'lat' e 'lon'.")
-
-# ----------------- Orari: open_mean → feature cicliche ----------------------
-if 'open_mean' in df.columns:
-    if df['open_mean'].dtype == object:
-        # Interpreta stringhe HH:MM
-        times = pd.to_datetime(df['open_mean'], format='%H:%M', errors='coerce')
-        df['open_mean'] = times.dt.hour * 60 + times.dt.minute
-    theta = 2 * np.pi * df['open_mean'].fillna(0) / 1440
-    df['open_sin'] = np.sin(theta)
-    df['open_cos'] = np.cos(theta)
-    df.drop(columns=['open_mean'], inplace=True)
-else:
-    df['open_sin'] = 0.0
-    df['open_cos'] = 0.0
-
-# ----------------------- Pipeline sklearn -----------------------------------
-num_cols = ['x', 'y', 'open_sin', 'open_cos']
-cat_cols = [c for c in df.columns if c not in num_cols and c not in {'uri', 'label'}]
-
-numeric_pipe = Pipeline([
-    ('impute', SimpleImputer(strategy='median')),
-    ('scale', StandardScaler()),
-])
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from telemetria import telemetry as tm
+
+NUM_COLS  = ['x', 'y', 'open_sin', 'open_cos']
+RESERVOIR = 100_000        # righe campionate per le mediane in modalità streaming
+
+# ----------------------- Feature derivate -----------------------------------
+def add_features(df: pd.DataFrame) -> pd.DataFrame:
+    """lat/lon → x/y in metri (UTM 33N), open_mean → open_sin/open_cos."""
+    df = df.copy()
+    # ----------------- Coordinate: lat/lon → metri, scaler ----------------------
+    if {'lat', 'lon'}.issubset(df.columns):
+        transformer = Transformer.from_crs("EPSG:4326", "EPSG:32633", always_xy=True)
+        x_m, y_m = transformer.transform(df['lon'].to_numpy(), df['lat'].to_numpy())
+        df['x'] = x_m
+        df['y'] = y_m
+        df.drop(columns=['lat', 'lon'], inplace=True)
+    else:
+        raise ValueError("Il CSV deve contenere colonne 'lat' e 'lon'.")
+
+    # ----------------- Orari: open_mean → feature cicliche ----------------------
+    if 'open_mean' in df.columns:
+        if df['open_mean'].dtype == object:
+            # Interpreta stringhe HH:MM
+            times = pd.to_datetime(df['open_mean'], format='%H:%M', errors='coerce')
+            df['open_mean'] = times.dt.hour * 60 + times.dt.minute
+        theta = 2 * np.pi * df['open_mean'].fillna(0) / 1440
+        df['open_sin'] = np.sin(theta)
+        df['open_cos'] = np.cos(theta)
+        df.drop(columns=['open_mean'], inplace=True)
+    else:
+        df['open_sin'] = 0.0
+        df['open_cos'] = 0.0
+    return df
 
-categorical_pipe = Pipeline([
-    ('impute', SimpleImputer(strategy='most_frequent')),
-    ('onehot', OneHotEncoder(handle_unknown='ignore')),
-])
 
-prep = ColumnTransformer([
-    ('num', numeric_pipe, num_cols),
-    ('cat', categorical_pipe, cat_cols)
-])
-
-# ----------------------- Fit & transform ------------------------------------
-X = prep.fit_transform(df)
-
-# ----------------------- Persistenza ----------------------------------------
-joblib.dump(prep, PIPE)
-
-# Il CSV trasformato è solo a scopo di debug / ispezione: se X è sparse lo densifichiamo.
-if hasattr(X, 'todense'):
-    X_dense = X.todense()
-else:
-    X_dense = X
-
-pd.DataFrame(np.asarray(X_dense)).to_csv(PREP, index=False)
-
-print("✅  Pre-processing completato. File salvati:\n    • Dati:   {}\n    • Pipeline: {}".format(PREP, PIPE))
\ No newline at end of file
+# ----------------------- Pipeline sklearn -----------------------------------
+def build_pipeline(cat_cols: list[str], categories="auto") -> ColumnTransformer:
+    numeric_pipe = Pipeline([
+        ('impute', SimpleImputer(strategy='median')),
+        ('scale', StandardScaler()),
+    ])
+
+    categorical_pipe = Pipeline([
+        ('impute', SimpleImputer(strategy='most_frequent')),
+        ('onehot', OneHotEncoder(categories=categories, handle_unknown='ignore')),
+    ])
+
+    return ColumnTransformer([
+        ('num', numeric_pipe, NUM_COLS),
+        ('cat', categorical_pipe, cat_cols)
+    ])
+
+
+# ----------------------- Modalità streaming ---------------------------------
+def stream_preprocess(raw: Path, prep_csv: Path, prep_npy: Path, chunksize: int,
+                      reservoir: int = RESERVOIR, seed: int = 0) -> ColumnTransformer:
+    """Due passate a blocchi su ``raw``; restituisce la pipeline già "fittata"."""
+    rng = np.random.default_rng(seed)
+    scaler = StandardScaler()
+    counts: dict[str, pd.Series] = {}
+    sample, n = None, 0
+
+    # ---------- passata 1: statistiche ----------
+    with tm.timer("stream.pass1_s"):
+        for chunk in pd.read_csv(raw, chunksize=chunksize):
+            chunk = add_features(chunk)
+            cat_cols = [c for c in chunk.columns if c not in NUM_COLS and c not in {'uri', 'label'}]
+            chunk = chunk[NUM_COLS + cat_cols].reset_index(drop=True)
+            scaler.partial_fit(chunk[NUM_COLS].to_numpy(float))        # i NaN sono ignorati
+            for c in cat_cols:
+                vc = chunk[c].dropna().astype(str).value_counts()
+                counts[c] = vc if c not in counts else counts[c].add(vc, fill_value=0)
+
+            # reservoir sampling (algoritmo R) vettorizzato sul blocco
+            t = np.arange(n, n + len(chunk))
+            if sample is None:
+                sample = chunk.iloc[:reservoir].copy()
+            elif len(sample) < reservoir:
+                take = reservoir - len(sample)
+                sample = pd.concat([sample, chunk.iloc[:take]], ignore_index=True)
+            j = rng.integers(0, t + 1)
+            hit = (t >= reservoir) & (j < reservoir)
+            if hit.any():
+                sample.iloc[j[hit]] = chunk[hit].to_numpy()
+            n += len(chunk)
+    if sample is None:
+        raise ValueError(f"{raw} è vuoto")
+
+    cat_cols = list(counts) or [c for c in sample.columns if c not in NUM_COLS]
+    vocab = [sorted(counts[c].index) for c in cat_cols]
+    prep = build_pipeline(cat_cols, categories=vocab if vocab else "auto")
+    for c in cat_cols:
+        sample[c] = sample[c].where(sample[c].isna(), sample[c].astype(str))
+    prep.fit(sample)
+
+    # mediane dal campione, moda dai conteggi completi
+    num = prep.named_transformers_['num']
+    med = num['impute'].statistics_
+    if cat_cols:
+        prep.named_transformers_['cat']['impute'].statistics_ = np.array(
+            [counts[c].idxmax() for c in cat_cols], dtype=object)
+
+    # media/varianza esatte sui dati imputati: i valori mancanti valgono la mediana
+    seen = np.broadcast_to(scaler.n_samples_seen_, med.shape).astype(float)
+    miss = n - seen
+    mean = (seen * scaler.mean_ + miss * med) / n
+    var = (seen * (scaler.var_ + (scaler.mean_ - mean) ** 2) + miss * (med - mean) ** 2) / n
+    sc = num['scale']
+    sc.mean_, sc.var_, sc.n_samples_seen_ = mean, var, n
+    sc.scale_ = np.where(var > 0, np.sqrt(var), 1.0)
+    tm.gauge("stream.rows", n)
+
+    # ---------- passata 2: trasformazione su disco ----------
+    n_feat = len(NUM_COLS) + sum(len(v) for v in vocab)
+    out = np.lib.format.open_memmap(prep_npy, mode="w+", dtype=np.float64, shape=(n, n_feat))
+    row = 0
+    with tm.timer("stream.pass2_s"):
+        for i, chunk in enumerate(pd.read_csv(raw, chunksize=chunksize)):
+            chunk = add_features(chunk)
+            for c in cat_cols:
+                chunk[c] = chunk[c].where(chunk[c].isna(), chunk[c].astype(str))
+            X = prep.transform(chunk)
+            X = np.asarray(X.todense()) if hasattr(X, 'todense') else X
+            out[row:row + len(X)] = X
+            pd.DataFrame(X, columns=range(n_feat)).to_csv(
+                prep_csv, index=False, mode="w" if i == 0 else "a", header=(i == 0))
+            row += len(X)
+    out.flush()
+    tm.gauge("features.count", n_feat)
+    return prep
+
+
+def main():
+    # ----------------------------- CLI ------------------------------------------
+    parser = argparse.ArgumentParser(description="Pre-processing del CSV dei POI per una data città")
+    parser.add_argument("city", help="Nome città (es. Rome, Florence, Bari)")
+    parser.add_argument("--chunksize", type=int, default=None,
+                        help="Righe per blocco: attiva la modalità streaming (fuori memoria)")
+    args = parser.parse_args()
+    city = args.city.lower()
+    tm.setup("preprocess")
+
+    # --------------------------- Percorsi file ----------------------------------
+    RAW  = Path(f"data/poi_{city}.csv")
+    PREP = Path(f"data/poi_{city}_prep.csv")
+    PIPE = Path(f"data/pipeline_{city}.pkl")
+    PREP.parent.mkdir(parents=True, exist_ok=True)
+
+    # --------------------------- Lettura dati -----------------------------------
+    if not RAW.exists():
+        raise FileNotFoundError(f"Non trovo il file {RAW}; hai eseguito harvest_poi.py?")
+
+    if args.chunksize:
+        NPY = PREP.with_suffix(".npy")
+        prep = stream_preprocess(RAW, PREP, NPY, args.chunksize)
+        joblib.dump(prep, PIPE)
+        print("✅  Pre-processing (streaming) completato. File salvati:\n"
+              "    • Dati:   {} / {}\n    • Pipeline: {}".format(PREP, NPY, PIPE))
+        return
+
+    with tm.timer("io.read_s"):
+        df = pd.read_csv(RAW)
+    tm.gauge("poi.count", len(df))
+
+    df = add_features(df)
+
+    # ----------------------- Pipeline sklearn -----------------------------------
+    cat_cols = [c for c in df.columns if c not in NUM_COLS and c not in {'uri', 'label'}]
+    prep = build_pipeline(cat_cols)
+
+    # ----------------------- Fit & transform ------------------------------------
+    with tm.timer("pipeline.fit_transform_s"):
+        X = prep.fit_transform(df)
+    tm.gauge("features.count", X.shape[1])
+
+    # ----------------------- Persistenza ----------------------------------------
+    joblib.dump(prep, PIPE)
+
+    # Il CSV trasformato è solo a scopo di debug / ispezione: se X è sparse lo densifichiamo.
+    if hasattr(X, 'todense'):
+        X_dense = X.todense()
+    else:
+        X_dense = X
+
+    pd.DataFrame(np.asarray(X_dense)).to_csv(PREP, index=False)
+
+    print("✅  Pre-processing completato. File salvati:\n    • Dati:   {}\n    • Pipeline: {}".format(PREP, PIPE))
+
+
+if __name__ == "__main__":
+    main()
@@ -3,91 +3,136 @@
 
 • Usa la matrice NumPy distance_matrix_<city>.npy (float32, np.inf)
 • Ri-ordina il tour_<city>.csv minimizzando il cammino a piedi.
-• URI mappati alle righe/colonne corrette tramite poi_<city>_cluster.csv.
+• URI mappati alle righe/colonne tramite distance_matrix_<city>.meta.json
+  (o, se manca, l'ordine di poi_<city>_cluster.csv).
+• La matrice è aperta in mmap (nessuna copia privata per processo).
 • Salta POI isolati (tutti archi infiniti) per evitare percorsi impossibili.
+
+order_tour() / astar() sono riusate dal planner batch.
 """
 from __future__ import annotations
 
-import sys, heapq
+import sys, heapq, time
 from pathlib import Path
 import numpy as np
 import pandas as pd
 
-CITY = sys.argv[1] if len(sys.argv) > 1 else "Rome"
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from telemetria import telemetry as tm
+from matrix.matrix_store import load_matrix, load_index
+
 DATA = Path(__file__).resolve().parents[2] / "data"
-TOUR_IN   = DATA / f"tour_{CITY.lower()}.csv"
-MAT_FILE  = DATA / f"distance_matrix_{CITY.lower()}.npy"
-CLUST_IN  = DATA / f"poi_{CITY.lower()}_cluster.csv"
-ROUTE_OUT = DATA / f"route_{CITY.lower()}.csv"
-
-# ---------- checks ----------
-for f,p in [("tour",TOUR_IN),("matrix",MAT_FILE),("cluster",CLUST_IN)]:
-    if not p.exists():
-        sys.exit(f"💥  File {f} mancante: {p}")
-
-# ---------- load ------------
-D = np.load(MAT_FILE)
-cluster_df = pd.read_csv(CLUST_IN)
-uri2idx = dict(zip(cluster_df['uri'], cluster_df.index))
-
-orig_tour = pd.read_csv(TOUR_IN)
-# filtra URI non presenti nella matrice (es. rari mismatch)
-orig_tour = orig_tour[orig_tour['uri'].isin(uri2idx)].reset_index(drop=True)
-
-idx_list = [uri2idx[u] for u in orig_tour['uri']]
-N = len(idx_list)
-if N == 0:
-    sys.exit("💥  Nessun POI del tour presente nella matrice.")
-
-# ---------- costo -----------
-def cost(a:int,b:int)->float:
-    i,j = idx_list[a], idx_list[b]
-    val = D[i,j]
-    return float(val) if np.isfinite(val) else None  # None = impassable
-
-# ---------- pre-check isolate nodes ----------
-reachable = [any(np.isfinite(D[idx_list[i], idx_list[j]]) for j in range(N) if j!=i)
-             for i in range(N)]
-if not all(reachable):
-    drop = [i for i,r in enumerate(reachable) if not r]
-    print("⚠️  POI isolati rimossi:", len(drop))
-    keep = [i for i in range(N) if i not in drop]
-    orig_tour = orig_tour.iloc[keep].reset_index(drop=True)
-    idx_list  = [idx_list[i] for i in keep]
-    N = len(idx_list)
-    if N<2:
-        sys.exit("💥  Troppi isolati, impossibile ordinare.")
 
-# ---------- heuristic (min finite edge) -------
-finite_edges = [[cost(i,j) for j in range(N) if i!=j and cost(i,j) is not None]
-                for i in range(N)]
-min_out = [min(ed) for ed in finite_edges]
 
 # ---------- A* -------------------------------
-goal_mask = (1<<N)-1
-pq=[(0,0,1,0,[0])]  # (f,g,mask,last,path)
-best={}
-while pq:
-    f,g,mask,last,path = heapq.heappop(pq)
-    if mask==goal_mask:
-        best_path,tot=g,path; break
-    if best.get((mask,last),1e18)<=g:continue
-    best[(mask,last)]=g
-    for nxt in range(N):
-        if mask&(1<<nxt):continue
-        c = cost(last,nxt)
-        if c is None: continue
-        g2=g+c; h=min_out[nxt]
-        heapq.heappush(pq,(g2+h,g2,mask|(1<<nxt),nxt,path+[nxt]))
-else:
-    sys.exit("💥  Nessun percorso percorribile trovato (grafo disconnesso).")
-
-# ---------- export ---------------------------
-ordered = orig_tour.iloc[path].reset_index(drop=True)
-cum=[0]
-for a,b in zip(path[:-1],path[1:]):
-    cum.append(cum[-1]+cost(a,b))
-ordered['cum_walk_s']=cum
-ordered.to_csv(ROUTE_OUT,index=False,encoding='utf-8')
-print(f"✅  Route ottimizzata → {ROUTE_OUT.relative_to(Path.cwd())}")
-print(f"   Tempo totale di cammino: {cum[-1]/60:.0f} min")
\ No newline at end of file
+def astar(W: np.ndarray, start: int = 0):
+    """Cammino hamiltoniano minimo su W (k×k, inf = impercorribile) da ``start``.
+
+    Restituisce (path, stats); path è None se il grafo è disconnesso."""
+    N = len(W)
+    # ---------- costo -----------
+    fin = np.isfinite(W)
+    cost = lambda a, b: float(W[a, b]) if fin[a, b] else None  # None = impassable
+
+    # ---------- heuristic (min finite edge) -------
+    off = ~np.eye(N, dtype=bool) & fin
+    min_out = [float(W[i, off[i]].min()) if off[i].any() else 0.0 for i in range(N)]
+
+    goal_mask = (1<<N)-1
+    pq=[(0,0,1<<start,start,[start])]  # (f,g,mask,last,path)
+    best={}
+    popped=expanded=pushed=pruned=max_pq=0
+    t0=time.perf_counter()
+    path=None
+    while pq:
+        f,g,mask,last,cur = heapq.heappop(pq); popped+=1
+        if mask==goal_mask:
+            path=cur; break
+        if best.get((mask,last),1e18)<=g:
+            pruned+=1; continue
+        best[(mask,last)]=g; expanded+=1
+        for nxt in range(N):
+            if mask&(1<<nxt):continue
+            c = cost(last,nxt)
+            if c is None: continue
+            g2=g+c; h=min_out[nxt]
+            heapq.heappush(pq,(g2+h,g2,mask|(1<<nxt),nxt,cur+[nxt])); pushed+=1
+        max_pq=max(max_pq,len(pq))
+    stats = dict(found=path is not None,n=N,popped=popped,expanded=expanded,pushed=pushed,
+                 pruned=pruned,max_frontier=max_pq,closed_states=len(best),
+                 wall_time_s=time.perf_counter()-t0)
+    return path, stats
+
+
+def order_tour(tour: pd.DataFrame, D: np.ndarray, uri2idx: dict, start: int = 0):
+    """Ordina le righe di ``tour`` (partendo dalla riga ``start``) e aggiunge cum_walk_s.
+
+    Restituisce (route, stats); solleva ValueError se l'ordinamento è impossibile."""
+    # filtra URI non presenti nella matrice (es. rari mismatch)
+    known = tour['uri'].isin(uri2idx)
+    if not known.any():
+        raise ValueError("Nessun POI del tour presente nella matrice.")
+    start_uri = tour['uri'].iloc[start]
+    tour = tour[known].reset_index(drop=True)
+    idx_list = [uri2idx[u] for u in tour['uri']]
+    N = len(idx_list)
+    W = np.asarray(D[np.ix_(idx_list, idx_list)], dtype=float)
+
+    # ---------- pre-check isolate nodes ----------
+    fin = np.isfinite(W) & ~np.eye(N, dtype=bool)
+    keep = np.flatnonzero(fin.any(axis=1))
+    isolated = N - len(keep)
+    if isolated:
+        tour = tour.iloc[keep].reset_index(drop=True)
+        W = W[np.ix_(keep, keep)]
+        N = len(keep)
+        if N<2:
+            raise ValueError("Troppi isolati, impossibile ordinare.")
+    hit = np.flatnonzero(tour['uri'].to_numpy() == start_uri)
+    path, stats = astar(W, int(hit[0]) if len(hit) else 0)
+    stats["isolated"] = isolated
+    if path is None:
+        raise ValueError("Nessun percorso percorribile trovato (grafo disconnesso).")
+
+    # ---------- export ---------------------------
+    ordered = tour.iloc[path].reset_index(drop=True)
+    cum=[0]
+    for a,b in zip(path[:-1],path[1:]):
+        cum.append(cum[-1]+float(W[a,b]))
+    ordered['cum_walk_s']=cum
+    return ordered, stats
+
+
+def main():
+    tm.setup("astar_order")
+    CITY = sys.argv[1] if len(sys.argv) > 1 else "Rome"
+    TOUR_IN   = DATA / f"tour_{CITY.lower()}.csv"
+    MAT_FILE  = DATA / f"distance_matrix_{CITY.lower()}.npy"
+    CLUST_IN  = DATA / f"poi_{CITY.lower()}_cluster.csv"
+    ROUTE_OUT = DATA / f"route_{CITY.lower()}.csv"
+
+    # ---------- checks ----------
+    for f,p in [("tour",TOUR_IN),("matrix",MAT_FILE),("cluster",CLUST_IN)]:
+        if not p.exists():
+            sys.exit(f"💥  File {f} mancante: {p}")
+
+    # ---------- load ------------
+    D = load_matrix(MAT_FILE)
+    uri2idx = load_index(MAT_FILE, CLUST_IN)
+
+    try:
+        ordered, stats = order_tour(pd.read_csv(TOUR_IN), D, uri2idx)
+    except ValueError as exc:
+        sys.exit(f"💥  {exc}")
+    if stats["isolated"]:
+        print("⚠️  POI isolati rimossi:", stats["isolated"])
+    tm.event("astar", **stats)
+
+    cum = ordered['cum_walk_s']
+    ordered.to_csv(ROUTE_OUT,index=False,encoding='utf-8')
+    print(f"✅  Route ottimizzata → {ROUTE_OUT.relative_to(Path.cwd())}")
+    print(f"   Tempo totale di cammino: {cum.iloc[-1]/60:.0f} min")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,207 @@
+#!/usr/bin/env python3
+"""Planner batch: molti utenti, città e giorni su un pool di processi.
+
+Input: CSV di job con colonne
+    user, city, date (YYYY-MM-DD), start_h, end_h [, days] [, score_col]
+Per ogni job e ogni giorno: selezione CP-SAT (solver_csp.solve_day) +
+ordinamento A* (astar_order.order_tour). Nei piani su più giorni i POI già
+usati nei giorni precedenti sono esclusi. Lo score usato è ``score_col`` se
+indicato, altrimenti ``score_<user>`` se la colonna esiste, altrimenti ``score``.
+
+POI e matrice sono caricati una volta nel processo principale. La matrice è
+aperta in mmap (matrix_store.py): tutti i processi condividono la stessa
+copia fisica. La tabella POI invece arriva ai worker con l'initializer, cioè
+serializzata: ogni worker ne ha una copia privata (piccola rispetto alla
+matrice).
+
+Le giornate già risolte per input equivalenti (stessa versione dei dati,
+score quantizzati, orari ed esclusioni uguali) sono riprese dalla cache di
+tour_cache.py: LRU per worker e, con ``--cache-dir``, livello su disco
+condiviso fra worker ed esecuzioni.
+
+Output: un unico file colonnare (Parquet se pyarrow/fastparquet è installato,
+altrimenti CSV), una riga per tappa.
+
+Esempio:
+    python src/solver/batch_planner.py jobs.csv --workers 8 --out data/tours_batch.parquet
+"""
+from __future__ import annotations
+
+import argparse, os, sys, time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from telemetria import telemetry as tm
+from matrix.matrix_store import load_index, open_shared
+from solver.solver_csp import load_poi, solve_day, DATA, SOLVER_TL
+from solver.astar_order import order_tour
+from solver.tour_cache import TourCache, data_version, fingerprint, rescore
+
+_CTX: dict = {}      # city → (POI, D, uri2idx, versione dati), popolato nel worker
+_OPTS: dict = {}
+
+
+def _init_worker(tables: dict, time_limit: float, solver_workers: int,
+                 cache_size: int = 0, cache_dir: str | None = None):
+    _CTX.clear()
+    for city, (poi, mat_src, uri2idx, version) in tables.items():
+        _CTX[city] = (poi, open_shared(mat_src), uri2idx, version)
+    _OPTS.update(time_limit=time_limit, solver_workers=solver_workers,
+                 cache=TourCache(cache_size, cache_dir) if cache_size else None)
+
+
+def load_jobs(path) -> pd.DataFrame:
+    """CSV dei job con le colonne facoltative normalizzate: una cella vuota
+    di ``days`` vale 1 giorno, una di ``score_col`` la scelta automatica."""
+    jobs = pd.read_csv(path)
+    days = jobs["days"] if "days" in jobs.columns else pd.Series(1, index=jobs.index)
+    jobs["days"] = days.fillna(1).astype(int)
+    if "score_col" in jobs.columns:
+        jobs["score_col"] = jobs["score_col"].fillna("")
+    return jobs
+
+
+def score_column(poi: pd.DataFrame, job: dict) -> str:
+    col = job.get("score_col")
+    if isinstance(col, str) and col:
+        return col
+    user_col = f"score_{job['user']}"
+    return user_col if user_col in poi.columns else "score"
+
+
+def solve_and_order(poi, D, uri2idx, start_h: int, end_h: int, col: str, used: set):
+    """CP-SAT + A* di una giornata: (route oppure None, esito)."""
+    tour, stats = solve_day(poi, start_h, end_h, col, exclude=used,
+                            time_limit=_OPTS["time_limit"], num_workers=_OPTS["solver_workers"])
+    status = stats["status"]
+    if tour is None or not len(tour):
+        return None, status
+    try:
+        route, _ = order_tour(tour, D, uri2idx)
+    except ValueError:
+        route, status = tour.assign(cum_walk_s=float("nan")), "UNORDERED"
+    return route, status
+
+
+def plan_job(job: dict) -> tuple[list[pd.DataFrame], list[dict]]:
+    """Pianifica tutti i giorni di un job; restituisce (route per giorno, esiti)."""
+    poi, D, uri2idx, version = _CTX[job["city"]]
+    col = score_column(poi, job)
+    start_h, end_h = int(job["start_h"]), int(job["end_h"])
+    cache = _OPTS["cache"]
+    used: set[str] = set()
+    routes, log = [], []
+    day0 = pd.Timestamp(job["date"])
+    days = job.get("days", 1)
+    for d in range(1 if pd.isna(days) else int(days) or 1):
+        t0 = time.perf_counter()
+        solve = lambda: solve_and_order(poi, D, uri2idx, start_h, end_h, col, used)
+        hit = False
+        if cache is None:
+            route, status = solve()
+        else:
+            key = fingerprint(version, poi[col], start_h, end_h, exclude=set(used),
+                              time_limit=_OPTS["time_limit"])
+            misses = cache.misses
+            route, status = cache.get_or_solve(
+                key, solve, cacheable=lambda r: r[1] in ("OPTIMAL", "FEASIBLE", "INFEASIBLE"))
+            hit = cache.misses == misses
+            if hit and route is not None:
+                route = rescore(route, poi, col)            # score correnti, non quelli in cache
+        if route is not None:
+            used.update(route["uri"])
+            routes.append(route.assign(job_id=job["job_id"], user=job["user"], city=job["city"],
+                                       date=(day0 + pd.Timedelta(days=d)).date().isoformat(),
+                                       day=d, stop=range(len(route))))
+        log.append(dict(job_id=job["job_id"], day=d, status=status,
+                        stops=0 if route is None else len(route), cached=hit,
+                        wall_s=time.perf_counter() - t0))
+    return routes, log
+
+
+def write_columnar(df: pd.DataFrame, out: Path) -> Path:
+    """Parquet se disponibile, altrimenti CSV con lo stesso nome base."""
+    if out.suffix == ".parquet":
+        try:
+            df.to_parquet(out, index=False)
+            return out
+        except ImportError:
+            out = out.with_suffix(".csv")
+            print("ℹ️  pyarrow/fastparquet non installati: salvo in CSV")
+    df.to_csv(out, index=False, encoding="utf-8")
+    return out
+
+
+def main():
+    par = argparse.ArgumentParser(description="Generazione batch di tour personalizzati")
+    par.add_argument("jobs", help="CSV: user,city,date,start_h,end_h[,days][,score_col]")
+    par.add_argument("--workers", type=int, default=os.cpu_count())
+    par.add_argument("--time-limit", type=float, default=SOLVER_TL, help="Secondi CP-SAT per giorno")
+    par.add_argument("--solver-workers", type=int, default=1,
+                     help="Thread CP-SAT per job (1 evita oversubscription col pool)")
+    par.add_argument("--cache-size", type=int, default=1024,
+                     help="Voci della cache LRU per worker (0 = disattivata)")
+    par.add_argument("--cache-dir", default=None,
+                     help="Livello su disco della cache, condiviso fra worker ed esecuzioni")
+    par.add_argument("--out", default=str(DATA / "tours_batch.parquet"))
+    args = par.parse_args()
+    tm.setup("batch_planner")
+
+    jobs = load_jobs(args.jobs)
+    missing = {"user", "city", "date", "start_h", "end_h"} - set(jobs.columns)
+    if missing:
+        sys.exit(f"💥  Colonne mancanti nel file job: {sorted(missing)}")
+    jobs = jobs.assign(job_id=range(len(jobs)))
+    job_list = jobs.to_dict("records")
+
+    # ---------- tabelle condivise (una per città) ----------
+    tables = {}
+    for city in jobs["city"].unique():
+        mat = DATA / f"distance_matrix_{city.lower()}.npy"
+        if not mat.exists():
+            sys.exit(f"💥  Matrice mancante: {mat}")
+        poi = load_poi(city)
+        tables[city] = (poi, mat, load_index(mat, DATA / f"poi_{city.lower()}_cluster.csv"),
+                        data_version(poi, mat))
+    initargs = (tables, args.time_limit, args.solver_workers, args.cache_size, args.cache_dir)
+
+    t0 = time.perf_counter()
+    if args.workers <= 1:
+        _init_worker(*initargs)
+        results = list(map(plan_job, job_list))
+    else:
+        with ProcessPoolExecutor(args.workers, initializer=_init_worker, initargs=initargs) as ex:
+            results = list(ex.map(plan_job, job_list, chunksize=max(1, len(job_list) // (4 * args.workers))))
+    wall = time.perf_counter() - t0
+
+    routes = [r for rs, _ in results for r in rs]
+    log = pd.DataFrame([l for _, ls in results for l in ls])
+    n_tours = int((log["stops"] > 0).sum())
+    tm.gauge("batch.jobs", len(job_list))
+    tm.gauge("batch.tours", n_tours)
+    tm.gauge("batch.tours_per_s", n_tours / wall if wall else 0.0)
+    cached = log["cached"]
+    tm.gauge("cache.hit_rate", float(cached.mean()))
+    for status, cnt in log["status"].value_counts().items():
+        tm.incr("batch.days", cnt, status=status)
+
+    if not routes:
+        sys.exit("⚠️  Nessun tour generato")
+    cols = ["job_id", "user", "city", "date", "day", "stop"]
+    out_df = pd.concat(routes, ignore_index=True)
+    out_df = out_df[cols + [c for c in out_df.columns if c not in cols]]
+    out = write_columnar(out_df, Path(args.out))
+
+    failed = log[log["stops"] == 0]
+    print(f"✅  {n_tours} tour ({len(job_list)} job) in {wall:.1f}s "
+          f"→ {n_tours / wall:.1f} tour/s   salvati in {out}")
+    if args.cache_size:
+        print(f"♻️  Cache: {int(cached.sum())}/{len(log)} giornate senza risolvere ({cached.mean():.0%})")
+    if len(failed):
+        print(f"⚠️  {len(failed)} giornate senza soluzione: {failed['status'].value_counts().to_dict()}")
+
+
+if __name__ == "__main__":
+    main()
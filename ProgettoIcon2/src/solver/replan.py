@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+"""Ri-pianificazione incrementale a metà giornata.
+
+Quando un POI chiude all'improvviso o l'utente salta una tappa non si riparte
+da zero: si tiene fisso il prefisso già visitato di route_<city>.csv e si
+ri-ottimizzano solo gli slot rimasti.
+
+• candidati: i ``--candidates`` POI migliori per score (esclusi visitati,
+  chiusi e saltati) più le tappe ancora valide del piano precedente
+• CP-SAT (stesso modello di solver_csp.py) sugli slot liberi dopo l'ultimo
+  slot del prefisso (la route è salvata in ordine di cammino, non di slot),
+  con il piano precedente come hint (warm start) e time-limit ridotto
+• A* sulle nuove tappe a partire dalla posizione attuale dell'utente
+  (l'ultima tappa visitata o ``--at``)
+
+Esempio:
+    python src/solver/replan.py Rome --visited 3 --closed http://dbpedia.org/resource/X
+"""
+from __future__ import annotations
+
+import argparse, sys, time
+from pathlib import Path
+import pandas as pd
+from ortools.sat.python import cp_model
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from telemetria import telemetry as tm
+from matrix.matrix_store import load_matrix, load_index
+from solver.solver_csp import load_poi, build_model, tour_rows, solver_stats, DATA, START_H, END_H
+from solver.astar_order import order_tour
+
+REPLAN_TL  = 0.5       # secondi CP-SAT
+CANDIDATES = 200       # POI considerati oltre a quelli del piano precedente
+
+
+def slot_h(slot) -> int:
+    """Ora di inizio di uno slot "HH:00–HH:00"."""
+    return int(str(slot)[:2])
+
+
+def replan(POI: pd.DataFrame, D, uri2idx: dict, route: pd.DataFrame, visited: int,
+           now_h: int | None = None, closed=(), skipped=(), at: str | None = None,
+           end_h: int = END_H, score_col: str = "score", candidates: int = CANDIDATES,
+           time_limit: float = REPLAN_TL):
+    """Restituisce (nuova route, statistiche). Le prime ``visited`` righe di
+    ``route`` restano invariate; si ri-ottimizzano gli slot dopo il massimo
+    slot del prefisso (e non prima di ``now_h``, se indicato)."""
+    t0 = time.perf_counter()
+    prefix = route.iloc[:visited]
+    used = {slot_h(s) for s in prefix["slot"]}
+    first = max(used) + 1 if used else START_H
+    now_h = first if now_h is None else max(now_h, first)
+    SLOTS = [s for s in range(now_h, end_h) if s not in used]
+    here = at or (prefix["uri"].iloc[-1] if len(prefix) else None)
+
+    banned = set(prefix["uri"]) | set(closed) | set(skipped)
+    if here is not None:
+        banned.add(here)
+    prev = route.iloc[visited:]
+    prev = prev[~prev["uri"].isin(banned)]
+
+    # ---------- candidati ----------
+    free = POI[~POI["uri"].isin(banned)]
+    cand = free.nlargest(candidates, score_col)
+    cand = pd.concat([cand, free[free["uri"].isin(prev["uri"]) & ~free.index.isin(cand.index)]])
+
+    stats = dict(visited=visited, now_h=now_h, n_cand=len(cand), kept=len(prev))
+    if not SLOTS or cand.empty:
+        return prefix.reset_index(drop=True), dict(stats, status="NO_SLOTS")
+
+    # ---------- modello + warm start ----------
+    model, sel = build_model(cand, SLOTS, score_col)
+    uri2p = dict(zip(cand["uri"], cand.index))
+    hinted = {(slot_h(r.slot), uri2p[r.uri]) for r in prev.itertuples() if r.uri in uri2p}
+    for key, v in sel.items():
+        model.AddHint(v, key in hinted)
+    stats["hints"] = len(hinted & sel.keys())
+
+    solver = cp_model.CpSolver()
+    solver.parameters.max_time_in_seconds = time_limit
+    status = solver.Solve(model)
+    stats.update(solver_stats(solver, status))
+    if status not in (cp_model.OPTIMAL, cp_model.FEASIBLE):
+        return prefix.reset_index(drop=True), stats
+    tour = tour_rows(cand, SLOTS, sel, solver.BooleanValue, score_col)
+
+    # ---------- ordinamento dalla posizione attuale ----------
+    base = float(prefix["cum_walk_s"].iloc[-1]) if len(prefix) else 0.0
+    rest = tour
+    if len(tour) and here is not None and here in uri2idx:
+        # la posizione attuale entra come riga 0 (partenza dell'A*) e poi si toglie
+        ordered, _ = order_tour(pd.concat([pd.DataFrame({"uri": [here]}), tour],
+                                          ignore_index=True), D, uri2idx)
+        if ordered["uri"].iloc[0] == here:
+            ordered = ordered.iloc[1:]
+        rest = ordered.assign(cum_walk_s=ordered["cum_walk_s"] + base)
+    elif len(tour):
+        ordered, _ = order_tour(tour, D, uri2idx)
+        rest = ordered.assign(cum_walk_s=ordered["cum_walk_s"] + base)
+    out = pd.concat([prefix, rest], ignore_index=True)
+    hours = out["slot"].map(slot_h)
+    if hours.duplicated().any():
+        raise ValueError(f"slot ripetuti nella route ri-pianificata: {sorted(hours[hours.duplicated()])}")
+    stats["replan_s"] = time.perf_counter() - t0
+    return out, stats
+
+
+def main():
+    par = argparse.ArgumentParser(description="Ri-pianifica il resto della giornata")
+    par.add_argument("city")
+    par.add_argument("--visited", type=int, required=True, help="Tappe già visitate (prefisso)")
+    par.add_argument("--now", type=int, default=None, help="Ora attuale (default: slot dopo l'ultimo visitato)")
+    par.add_argument("--closed", nargs="*", default=[], help="URI chiusi inaspettatamente")
+    par.add_argument("--skip", nargs="*", default=[], help="URI che l'utente vuole saltare")
+    par.add_argument("--at", default=None, help="URI della posizione attuale (default ultima visitata)")
+    par.add_argument("--candidates", type=int, default=CANDIDATES)
+    par.add_argument("--time-limit", type=float, default=REPLAN_TL)
+    par.add_argument("--out", default=None, help="Default: sovrascrive route_<city>.csv")
+    args = par.parse_args()
+    tm.setup("replan")
+
+    city = args.city.lower()
+    route_file = DATA / f"route_{city}.csv"
+    mat_file = DATA / f"distance_matrix_{city}.npy"
+    if not route_file.exists() or not mat_file.exists():
+        sys.exit("💥  Servono route_<city>.csv e distance_matrix_<city>.npy")
+
+    POI = load_poi(args.city)
+    D = load_matrix(mat_file)
+    uri2idx = load_index(mat_file, DATA / f"poi_{city}_cluster.csv")
+    route = pd.read_csv(route_file)
+    if not 0 <= args.visited <= len(route):
+        sys.exit(f"💥  --visited deve essere fra 0 e {len(route)}")
+
+    new_route, stats = replan(POI, D, uri2idx, route, args.visited, args.now,
+                              args.closed, args.skip, args.at,
+                              candidates=args.candidates, time_limit=args.time_limit)
+    tm.event("replan", **stats)
+    if "replan_s" not in stats:
+        sys.exit(f"⚠️  Nessun nuovo piano ({stats.get('status')}): route invariata")
+
+    out = Path(args.out) if args.out else route_file
+    new_route.to_csv(out, index=False, encoding="utf-8")
+    print(f"✅  Route ri-pianificata in {stats['replan_s']*1000:.0f} ms "
+          f"({stats['status']}, {len(new_route) - args.visited} nuove tappe) → {out}")
+
+
+if __name__ == "__main__":
+    main()
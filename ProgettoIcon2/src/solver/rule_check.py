@@ -0,0 +1,204 @@
+#!/usr/bin/env python3
+"""RF11 – post-check vettoriale su un *batch* di route.
+
+Stesse tre regole di postcheck_experta.py:
+1. ``triple_same_type`` – tre POI consecutivi con lo stesso *type*.
+2. ``long_walk``        – tratto di cammino > 30 min fra due POI consecutivi.
+3. ``archeo_late``      – "ArchaeologicalSite" visitato dalle 16 in poi.
+
+Le regole sono valutate come operazioni su colonne (pandas/NumPy) su tutte le
+route in una volta: niente fatti per singola tappa, niente join Rete.
+Il risultato è un DataFrame di violazioni (una riga per violazione) con colonne
+``route_id, rule, idx, type, value``.
+
+Input atteso: DataFrame "lungo" con una riga per tappa e colonne
+``route_id`` (opzionale: se manca è un'unica route), ``slot``, ``type``,
+``cum_walk_s``, nell'ordine di visita.
+
+La modalità ``engine="experta"`` esegue le stesse regole con Experta ed è
+pensata per i test di parità.
+
+Esempio:
+    python src/solver/rule_check.py Rome
+    python src/solver/rule_check.py Rome --parity
+"""
+from __future__ import annotations
+
+import argparse, collections, collections.abc, sys
+from pathlib import Path
+import numpy as np
+import pandas as pd
+
+for _n in ("Mapping", "MutableMapping", "MutableSequence"):
+    if not hasattr(collections, _n):
+        setattr(collections, _n, getattr(collections.abc, _n))
+try:
+    import experta
+except ImportError:
+    experta = None
+
+MAX_WALK_S   = 1800                  # 30 min
+LATE_HOUR    = 16
+LATE_TYPE    = "ArchaeologicalSite"
+VIOL_COLUMNS = ["route_id", "rule", "idx", "type", "value"]
+
+
+# ---------- preparazione colonne ----------
+def prepare(routes: pd.DataFrame) -> pd.DataFrame:
+    """Aggiunge ``route_id``, ``idx`` (posizione nella route), ``start_h`` e
+    ``walk`` (secondi verso la tappa successiva, 0 per l'ultima)."""
+    df = routes.reset_index(drop=True)
+    if "route_id" not in df.columns:
+        df = df.assign(route_id=0)
+    rid = df["route_id"].to_numpy()
+    df["idx"] = df.groupby("route_id", sort=False).cumcount().to_numpy()
+    df["start_h"] = df["slot"].astype(str).str[:2].astype(int)
+    cum = df["cum_walk_s"].to_numpy(dtype=float)
+    same_next = np.r_[rid[1:] == rid[:-1], False]
+    walk = np.zeros(len(df))
+    walk[:-1] = cum[1:] - cum[:-1]
+    df["walk"] = np.where(same_next, walk, 0.0)
+    return df
+
+
+# ---------- regole vettoriali ----------
+def check_routes(routes: pd.DataFrame) -> pd.DataFrame:
+    """Valuta le tre regole su tutte le route in blocco."""
+    df = prepare(routes)
+    rid  = df["route_id"].to_numpy()
+    typ  = df["type"].to_numpy()
+    idx  = df["idx"].to_numpy()
+
+    out = []
+    # 1) finestra di 3 tappe consecutive della stessa route con lo stesso tipo
+    if len(df) >= 3:
+        same = ((rid[:-2] == rid[1:-1]) & (rid[1:-1] == rid[2:]) &
+                (typ[:-2] == typ[1:-1]) & (typ[1:-1] == typ[2:]))
+        hit = np.flatnonzero(same)
+        out.append(pd.DataFrame({"route_id": rid[hit], "rule": "triple_same_type",
+                                 "idx": idx[hit], "type": typ[hit], "value": 3.0}))
+    # 2) tratto di cammino troppo lungo
+    hit = np.flatnonzero(df["walk"].to_numpy() > MAX_WALK_S)
+    out.append(pd.DataFrame({"route_id": rid[hit], "rule": "long_walk",
+                             "idx": idx[hit], "type": typ[hit],
+                             "value": df["walk"].to_numpy()[hit]}))
+    # 3) sito archeologico nel tardo pomeriggio
+    hit = np.flatnonzero((typ == LATE_TYPE) & (df["start_h"].to_numpy() >= LATE_HOUR))
+    out.append(pd.DataFrame({"route_id": rid[hit], "rule": "archeo_late",
+                             "idx": idx[hit], "type": typ[hit],
+                             "value": df["start_h"].to_numpy()[hit].astype(float)}))
+
+    viol = pd.concat(out, ignore_index=True)
+    return sort_violations(viol)
+
+
+def sort_violations(viol: pd.DataFrame) -> pd.DataFrame:
+    """Ordine canonico (utile per confrontare i due motori)."""
+    viol = viol.reindex(columns=VIOL_COLUMNS)
+    # object anche per gli id interi: un risultato vuoto altrimenti sarebbe
+    # int64 col motore vettoriale e object con Experta
+    viol["route_id"] = viol["route_id"].astype(object)
+    viol["rule"] = viol["rule"].astype(str)
+    viol["type"] = viol["type"].astype(str)
+    viol["idx"] = viol["idx"].astype(int)
+    viol["value"] = viol["value"].astype(float)
+    return viol.sort_values(["route_id", "rule", "idx"]).reset_index(drop=True)
+
+
+# ---------- modalità Experta (parità) ----------
+if experta is not None:
+    from experta import Fact, KnowledgeEngine, Rule, MATCH, TEST
+
+    class POIFact(Fact):
+        """type, idx, start_h, walk"""
+        pass
+
+    class TourRules(KnowledgeEngine):
+        """Stesse regole di postcheck_experta.py, ma raccoglie le violazioni."""
+
+        def __init__(self):
+            super().__init__()
+            self.violations = []
+
+        @Rule(POIFact(type=MATCH.t, idx=MATCH.i1),
+              POIFact(type=MATCH.t, idx=MATCH.i2),
+              POIFact(type=MATCH.t, idx=MATCH.i3),
+              TEST(lambda i1, i2, i3: i2 == i1 + 1 and i3 == i2 + 1))
+        def triple_same_type(self, t, i1):
+            self.violations.append(("triple_same_type", i1, t, 3.0))
+
+        @Rule(POIFact(walk=MATCH.w, idx=MATCH.i, type=MATCH.t), TEST(lambda w: w > MAX_WALK_S))
+        def long_walk(self, w, i, t):
+            self.violations.append(("long_walk", i, t, float(w)))
+
+        @Rule(POIFact(type=LATE_TYPE, start_h=MATCH.h, idx=MATCH.i))
+        def archeo_late(self, h, i):
+            if h >= LATE_HOUR:
+                self.violations.append(("archeo_late", i, LATE_TYPE, float(h)))
+
+
+def check_routes_experta(routes: pd.DataFrame) -> pd.DataFrame:
+    """Una KnowledgeEngine per route: lento, ma di riferimento."""
+    if experta is None:
+        raise SystemExit("Installa experta oppure usa il motore vettoriale")
+    df = prepare(routes)
+    rows = []
+    for rid, grp in df.groupby("route_id", sort=False):
+        eng = TourRules()
+        eng.reset()
+        for r in grp.itertuples():
+            eng.declare(POIFact(idx=int(r.idx), type=r.type,
+                                start_h=int(r.start_h), walk=float(r.walk)))
+        eng.run()
+        rows += [(rid, *v) for v in eng.violations]
+    return sort_violations(pd.DataFrame(rows, columns=VIOL_COLUMNS))
+
+
+def run_check(routes: pd.DataFrame, engine: str = "vector") -> pd.DataFrame:
+    return check_routes_experta(routes) if engine == "experta" else check_routes(routes)
+
+
+def format_violation(v) -> str:
+    """Messaggio testuale identico a quello storico di postcheck_experta.py."""
+    if v.rule == "triple_same_type":
+        return f"⚠️  Tre POI consecutivi di tipo {v.type} a partire dallo slot {v.idx}."
+    if v.rule == "long_walk":
+        return (f"⚠️  Tratto di cammino >30 min fra slot {v.idx} e {v.idx+1} "
+                f"({v.value/60:.1f} min).")
+    return f"⚠️  Visita a sito archeologico dopo le 16 (slot {int(v.value)}:00)."
+
+
+# ---------- CLI ----------
+def main():
+    par = argparse.ArgumentParser(description="Post-check vettoriale delle route")
+    par.add_argument("city")
+    par.add_argument("--routes", help="CSV con più route (colonna route_id); "
+                                      "default data/route_<city>.csv")
+    par.add_argument("--engine", choices=["vector", "experta"], default="vector")
+    par.add_argument("--parity", action="store_true",
+                     help="Confronta motore vettoriale ed Experta")
+    par.add_argument("--out", help="Salva le violazioni in CSV")
+    args = par.parse_args()
+
+    path = Path(args.routes) if args.routes else Path("data", f"route_{args.city.lower()}.csv")
+    if not path.exists():
+        sys.exit(f"💥  File route mancante: {path}")
+    routes = pd.read_csv(path)
+
+    if args.parity:
+        a, b = check_routes(routes), check_routes_experta(routes)
+        if not a.equals(b):
+            print(a.compare(b) if a.shape == b.shape else f"{len(a)} vs {len(b)} violazioni")
+            sys.exit("💥  Parità fallita fra motore vettoriale ed Experta")
+        print(f"✅  Parità OK ({len(a)} violazioni)")
+        return
+
+    viol = run_check(routes, args.engine)
+    print(viol.to_string(index=False) if len(viol) else "Nessuna violazione")
+    if args.out:
+        viol.to_csv(args.out, index=False)
+        print(f"✅  Violazioni salvate → {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -4,91 +4,391 @@ Seleziona l’insieme ottimo di POI (RF10) con OR-Tools CP-SAT
 – legge i punteggi personalizzati (poi_<city>_scored.csv)
 – accetta POI senza orari: li considera “sempre aperti”
 – opzionale: porta con sé il cluster (se presente) – utile nei post-check
+
+Le funzioni (load_poi, build_model, solve_day) sono riusate dal planner batch.
+
+Modalità ``--decompose``: ogni cluster (e con ``--pairs`` ogni coppia di
+cluster vicini a piedi) è un sotto-problema CP-SAT indipendente, risolto in
+parallelo; un piccolo problema master sugli slot ricompone il tour a partire
+dai soli POI scelti nei sotto-problemi. Il tempo cresce con la dimensione dei
+cluster, non con quella dell'intero catalogo.
+
+Modalità ``--joint``: selezione e ordinamento in un solo modello
+(orienteering). I ``JOINT_TOP`` POI migliori sono nodi di un ``AddCircuit``
+con deposito fittizio; gli archi esistono solo verso i ``JOINT_KNN`` vicini
+più prossimi e mai oltre ``MAX_LEG_S``; la posizione nel circuito è lo slot
+orario (quindi vale il vincolo di apertura) e l'obiettivo è
+score − ``WALK_W`` × minuti di cammino. Scrive direttamente tour e route,
+senza passare da astar_order.py.
 """
 
-import sys
+import argparse, os, sys, time
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
+import numpy as np
 import pandas as pd
 from ortools.sat.python import cp_model
 
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from telemetria import telemetry as tm
+
 # ─────────────────────────── parametri base
-CITY       = sys.argv[1] if len(sys.argv) > 1 else "Rome"
 START_H, END_H = 9, 18             # slot orari (9-10, 10-11, … 17-18)
 SOLVER_TL  = 10                    # secondi di time-limit
+ADJ_S      = 1200                  # cluster "adiacenti": mediana dei tempi a piedi < 20 min
+JOINT_TOP  = 60                    # --joint: candidati (migliori per score)
+JOINT_KNN  = 12                    # --joint: archi verso i vicini più prossimi
+MAX_LEG_S  = 1800                  # --joint: nessun tratto oltre 30 min (regola long_walk)
+WALK_W     = 1                     # --joint: punti di obiettivo (score×100) per minuto a piedi
 
 DATA = Path(__file__).resolve().parents[2] / "data"
-POI  = pd.read_csv(DATA / f"poi_{CITY.lower()}_scored.csv")   # ← nuovo file
 
-# 1) aggiungi cluster se serve (facoltativo – commenta se non ti occorre)
-cluster_file = DATA / f"poi_{CITY.lower()}_cluster.csv"
-if cluster_file.exists():
-    clusters = pd.read_csv(cluster_file)[["uri", "cluster"]]
-    POI = POI.merge(clusters, on="uri", how="left")
 
-# 2) gestisci eventuali colonne open / close mancanti
-if "open" not in POI.columns:
-    POI["open"]  = "00:00"
-    POI["close"] = "24:00"
-POI["open"]  = POI["open"].fillna("00:00")
-POI["close"] = POI["close"].fillna("24:00")
+def load_poi(city: str) -> pd.DataFrame:
+    POI  = pd.read_csv(DATA / f"poi_{city.lower()}_scored.csv")   # ← nuovo file
+
+    # 1) aggiungi cluster se serve (facoltativo – commenta se non ti occorre)
+    cluster_file = DATA / f"poi_{city.lower()}_cluster.csv"
+    if cluster_file.exists():
+        clusters = pd.read_csv(cluster_file)[["uri", "cluster"]]
+        POI = POI.merge(clusters, on="uri", how="left")
+
+    # 2) gestisci eventuali colonne open / close mancanti
+    if "open" not in POI.columns:
+        POI["open"]  = "00:00"
+        POI["close"] = "24:00"
+    POI["open"]  = POI["open"].fillna("00:00")
+    POI["close"] = POI["close"].fillna("24:00")
+    return POI
+
 
 # ─────────────────────────── modello CP-SAT
-SLOTS = list(range(START_H, END_H))            # 9…17 inclusi (9 slot)
-model = cp_model.CpModel()
-sel   = {(s, p): model.NewBoolVar(f"x_{s}_{p}")
-         for s in SLOTS for p in POI.index}
-
-# 3) vincoli: un POI per slot, un solo slot per POI
-for s in SLOTS:
-    model.Add(sum(sel[s, p] for p in POI.index) <= 1)
-for p in POI.index:
-    model.Add(sum(sel[s, p] for s in SLOTS) <= 1)
-
-# 3-bis) vieta tre POI consecutivi dello stesso 'type'
-for t in POI['type'].unique():
-    idx_same = [p for p in POI.index if POI.loc[p, 'type'] == t]
-    # scorre finestre di 3 slot (0-1-2, 1-2-3, …)
-    for s0, s1, s2 in zip(SLOTS, SLOTS[1:], SLOTS[2:]):
-        model.Add(
-            sum(sel[s, p] for s in (s0, s1, s2) for p in idx_same) <= 2
-        )
-
-# 4) vincolo di apertura/chiusura
-for s in SLOTS:
-    for p, row in POI.iterrows():
-        o = int(str(row["open"]).split(":")[0])     # ora di apertura
-        c = int(str(row["close"]).split(":")[0])    # ora di chiusura
-        if not (o <= s < c and s + 1 <= c):
-            model.Add(sel[s, p] == 0)
-
-# 5) obiettivo: massimizzare la somma dei punteggi
-model.Maximize(sum(int(row["score"] * 100) * sel[s, p]
-                   for s in SLOTS for p, row in POI.iterrows()))
-
-# ─────────────────────────── solve
-solver = cp_model.CpSolver()
-solver.parameters.max_time_in_seconds = SOLVER_TL
-status = solver.Solve(model)
-if status not in (cp_model.OPTIMAL, cp_model.FEASIBLE):
-    sys.exit("⚠️  Nessuna soluzione trovata")
-
-# ─────────────────────────── export tour
-rows = []
-for s in SLOTS:
-    chosen = [p for p in POI.index if solver.BooleanValue(sel[s, p])]
-    if not chosen:
-        continue
-    p = chosen[0]
-    rows.append({
-        "slot":   f"{s:02d}:00–{s+1:02d}:00",
-        "label":  POI.loc[p, "label"],
-        "uri":    POI.loc[p, "uri"],
-        "idx":    int(p),
-        "type":   POI.loc[p, "type"],
-        "score":  round(POI.loc[p, "score"], 3),
-        "cluster": POI.loc[p, "cluster"] if "cluster" in POI.columns else None
-    })
-
-out = DATA / f"tour_{CITY.lower()}.csv"
-pd.DataFrame(rows).to_csv(out, index=False, encoding="utf-8")
-print("✅  tour salvato →", out.relative_to(Path.cwd()))
+def build_model(POI: pd.DataFrame, SLOTS: list[int], score_col: str = "score"):
+    """Restituisce (model, sel) con sel[(slot, poi)] solo per le coppie ammesse
+    dagli orari: le altre sarebbero comunque fissate a 0."""
+    model = cp_model.CpModel()
+
+    # 4) vincolo di apertura/chiusura (ore intere, come "HH:MM".split(":")[0])
+    o = POI["open"].astype(str).str.split(":").str[0].astype(int).to_numpy()
+    c = POI["close"].astype(str).str.split(":").str[0].astype(int).to_numpy()
+    sel = {}
+    for s in SLOTS:
+        for p in POI.index[(o <= s) & (s < c) & (s + 1 <= c)]:
+            sel[s, p] = model.NewBoolVar(f"x_{s}_{p}")
+
+    ptype = POI["type"]
+    by_slot = {s: [] for s in SLOTS}
+    by_poi, by_type = {}, {}
+    for (s, p), v in sel.items():
+        by_slot[s].append(v)
+        by_poi.setdefault(p, []).append(v)
+        by_type.setdefault((ptype[p], s), []).append(v)
+
+    # 3) vincoli: un POI per slot, un solo slot per POI
+    for s in SLOTS:
+        if by_slot[s]:
+            model.Add(sum(by_slot[s]) <= 1)
+    for vs in by_poi.values():
+        if len(vs) > 1:
+            model.Add(sum(vs) <= 1)
+
+    # 3-bis) vieta tre POI consecutivi dello stesso 'type'
+    for t in ptype.unique():
+        # scorre finestre di 3 slot (0-1-2, 1-2-3, …)
+        for win in zip(SLOTS, SLOTS[1:], SLOTS[2:]):
+            vs = [v for s in win for v in by_type.get((t, s), [])]
+            if len(vs) > 2:
+                model.Add(sum(vs) <= 2)
+
+    # 5) obiettivo: massimizzare la somma dei punteggi
+    w = (POI[score_col] * 100).astype(int)
+    model.Maximize(sum(int(w[p]) * v for (s, p), v in sel.items()))
+    return model, sel
+
+
+def tour_rows(POI: pd.DataFrame, SLOTS, sel, value, score_col: str = "score") -> pd.DataFrame:
+    """Tour selezionato; ``value(var)`` legge la soluzione (solver o callback).
+    La colonna ``score`` riporta il valore di ``score_col`` (quello ottimizzato)."""
+    rows = []
+    for s in SLOTS:
+        chosen = [p for (s2, p), v in sel.items() if s2 == s and value(v)]
+        if not chosen:
+            continue
+        p = chosen[0]
+        rows.append({
+            "slot":   f"{s:02d}:00–{s+1:02d}:00",
+            "label":  POI.loc[p, "label"],
+            "uri":    POI.loc[p, "uri"],
+            "idx":    int(p),
+            "type":   POI.loc[p, "type"],
+            "score":  round(POI.loc[p, score_col], 3),
+            "cluster": POI.loc[p, "cluster"] if "cluster" in POI.columns else None
+        })
+    return pd.DataFrame(rows)
+
+
+def solver_stats(solver, status, **extra) -> dict:
+    obj = solver.ObjectiveValue() if status in (cp_model.OPTIMAL, cp_model.FEASIBLE) else None
+    bound = solver.BestObjectiveBound()
+    return dict(status=solver.StatusName(status), wall_time_s=solver.WallTime(),
+                objective=obj, best_bound=bound,
+                gap=(abs(bound - obj) / max(1.0, abs(obj))) if obj is not None else None,
+                branches=solver.NumBranches(), conflicts=solver.NumConflicts(), **extra)
+
+
+def solve_day(POI: pd.DataFrame, start_h: int = START_H, end_h: int = END_H,
+              score_col: str = "score", exclude=(), time_limit: float = SOLVER_TL,
+              num_workers: int = 0):
+    """Seleziona il tour di una giornata; ``exclude`` = URI già usati.
+
+    Restituisce (tour DataFrame oppure None se infeasible/timeout, statistiche)."""
+    if len(exclude):
+        POI = POI[~POI["uri"].isin(exclude)]
+    SLOTS = list(range(start_h, end_h))
+    t0 = time.perf_counter()
+    model, sel = build_model(POI, SLOTS, score_col)
+    build_s = time.perf_counter() - t0
+
+    solver = cp_model.CpSolver()
+    solver.parameters.max_time_in_seconds = time_limit
+    if num_workers:
+        solver.parameters.num_workers = num_workers
+    status = solver.Solve(model)
+    stats = solver_stats(solver, status, build_s=build_s, n_poi=len(POI),
+                         n_vars=len(sel), time_limit_s=time_limit)
+    if status not in (cp_model.OPTIMAL, cp_model.FEASIBLE):
+        return None, stats
+    return tour_rows(POI, SLOTS, sel, solver.BooleanValue, score_col), stats
+
+
+# ─────────────────────────── decomposizione per cluster
+def cluster_groups(POI: pd.DataFrame, D=None, uri2idx=None, adj_s: float = ADJ_S) -> list:
+    """Gruppi di indici POI: uno per cluster (NaN → gruppo a sé) e, se c'è la
+    matrice, uno per ogni coppia di cluster con mediana dei tempi < ``adj_s``."""
+    labels = POI["cluster"].fillna(-1) if "cluster" in POI.columns else pd.Series(0, POI.index)
+    groups = {c: idx for c, idx in POI.groupby(labels).groups.items()}
+    out = [list(idx) for idx in groups.values()]
+    if D is None:
+        return out
+
+    rows = {c: np.array([uri2idx[u] for u in POI.loc[idx, "uri"] if u in uri2idx])
+            for c, idx in groups.items()}
+    keys = [c for c in groups if c != -1 and len(rows[c])]
+    for i, a in enumerate(keys):
+        for b in keys[i + 1:]:
+            if np.median(D[np.ix_(rows[a], rows[b])]) < adj_s:
+                out.append(list(groups[a]) + list(groups[b]))
+    return out
+
+
+def _solve_group(task):
+    POI, start_h, end_h, score_col, time_limit = task
+    tour, stats = solve_day(POI, start_h, end_h, score_col, time_limit=time_limit, num_workers=1)
+    return ([] if tour is None else tour["idx"].tolist()), stats
+
+
+def solve_decomposed(POI: pd.DataFrame, start_h: int = START_H, end_h: int = END_H,
+                     score_col: str = "score", D=None, uri2idx=None, adj_s: float = ADJ_S,
+                     time_limit: float = SOLVER_TL, workers: int | None = None):
+    """Sotto-problemi per cluster in parallelo + master sui soli POI scelti.
+
+    Restituisce (tour oppure None, statistiche) come ``solve_day``."""
+    t0 = time.perf_counter()
+    groups = cluster_groups(POI, D, uri2idx, adj_s)
+    tasks = [(POI.loc[g], start_h, end_h, score_col, time_limit) for g in groups]
+    workers = min(workers or os.cpu_count() or 1, len(tasks))
+    if workers <= 1:
+        results = list(map(_solve_group, tasks))
+    else:
+        with ProcessPoolExecutor(workers) as ex:
+            results = list(ex.map(_solve_group, tasks))
+    sub_s = time.perf_counter() - t0
+
+    picked = sorted({p for idx, _ in results for p in idx})
+    tour, stats = solve_day(POI.loc[picked], start_h, end_h, score_col, time_limit=time_limit)
+    stats.update(n_groups=len(groups), sub_max_poi=max((len(g) for g in groups), default=0),
+                 sub_s=sub_s, master_poi=len(picked),
+                 sub_status={s: sum(r["status"] == s for _, r in results)
+                             for s in {r["status"] for _, r in results}})
+    return tour, stats
+
+
+# ─────────────────────────── selezione + ordinamento (orienteering)
+def solve_joint(POI: pd.DataFrame, D, uri2idx: dict, start_h: int = START_H, end_h: int = END_H,
+                score_col: str = "score", top: int = JOINT_TOP, knn: int = JOINT_KNN,
+                max_leg_s: float = MAX_LEG_S, walk_w: float = WALK_W,
+                time_limit: float = SOLVER_TL, num_workers: int = 0):
+    """Tour ordinato in una sola chiamata CP-SAT.
+
+    Restituisce (route con cum_walk_s oppure None, statistiche)."""
+    t0 = time.perf_counter()
+    n_slots = end_h - start_h
+    o = POI["open"].astype(str).str.split(":").str[0].astype(int)
+    c = POI["close"].astype(str).str.split(":").str[0].astype(int)
+    hours = {p: [k for k in range(n_slots) if o[p] <= start_h + k < c[p]] for p in POI.index}
+    cand = POI[POI["uri"].isin(uri2idx) & POI.index.map(lambda p: bool(hours[p]))]
+    cand = cand.nlargest(top, score_col)
+    P = list(cand.index)
+    rows = np.array([uri2idx[u] for u in cand["uri"]])
+    W = np.asarray(D[np.ix_(rows, rows)], dtype=float)
+    np.fill_diagonal(W, np.inf)
+
+    # archi: k vicini più prossimi (in entrambi i sensi), mai oltre max_leg_s
+    near = np.zeros_like(W, dtype=bool)
+    nn = np.argsort(W, axis=1)[:, :knn]
+    near[np.repeat(np.arange(len(P)), nn.shape[1]), nn.ravel()] = True
+    ok = (near | near.T) & (W <= max_leg_s)
+
+    model = cp_model.CpModel()
+    visit = [model.NewBoolVar(f"v_{p}") for p in P]
+    pos = [model.NewIntVarFromDomain(cp_model.Domain.FromValues(hours[p]), f"pos_{p}") for p in P]
+    arcs, lit = [(0, 0, model.NewBoolVar("empty"))], {}
+    for i in range(len(P)):
+        first, last = model.NewBoolVar(f"first_{i}"), model.NewBoolVar(f"last_{i}")
+        arcs += [(0, i + 1, first), (i + 1, 0, last), (i + 1, i + 1, visit[i].Not())]
+        model.Add(pos[i] == 0).OnlyEnforceIf(first)
+    for i, j in zip(*np.nonzero(ok)):
+        lit[i, j] = model.NewBoolVar(f"a_{i}_{j}")
+        arcs.append((i + 1, j + 1, lit[i, j]))
+        model.Add(pos[j] == pos[i] + 1).OnlyEnforceIf(lit[i, j])
+    model.AddCircuit(arcs)
+    model.Add(sum(visit) <= n_slots)            # ridondante, rafforza il rilassamento LP
+
+    # vieta tre POI consecutivi dello stesso 'type'
+    ptype = cand["type"].to_numpy()
+    succ = {}
+    for i, j in lit:
+        succ.setdefault(i, []).append(j)
+    for (i, j), a in lit.items():
+        for k in succ.get(j, []):
+            if k != i and ptype[i] == ptype[j] == ptype[k]:
+                model.AddBoolOr([a.Not(), lit[j, k].Not()])
+
+    w = (cand[score_col] * 100).astype(int).to_numpy()
+    walk_cost = {a: int(round(W[a] / 60 * walk_w)) for a in lit}
+    model.Maximize(sum(int(w[i]) * visit[i] for i in range(len(P)))
+                   - sum(walk_cost[a] * v for a, v in lit.items()))
+    build_s = time.perf_counter() - t0
+
+    solver = cp_model.CpSolver()
+    solver.parameters.max_time_in_seconds = time_limit
+    solver.parameters.linearization_level = 2
+    if num_workers:
+        solver.parameters.num_workers = num_workers
+    status = solver.Solve(model)
+    stats = solver_stats(solver, status, build_s=build_s, n_poi=len(P), n_arcs=len(lit),
+                         time_limit_s=time_limit)
+    if status not in (cp_model.OPTIMAL, cp_model.FEASIBLE):
+        return None, stats
+
+    # ---------- ricostruzione del circuito ----------
+    order = sorted((solver.Value(pos[i]), i) for i in range(len(P)) if solver.BooleanValue(visit[i]))
+    rows_out, cum = [], 0.0
+    for n, (k, i) in enumerate(order):
+        if n:
+            cum += W[order[n - 1][1], i]
+        p = P[i]
+        rows_out.append({
+            "slot":   f"{start_h + k:02d}:00–{start_h + k + 1:02d}:00",
+            "label":  POI.loc[p, "label"],
+            "uri":    POI.loc[p, "uri"],
+            "idx":    int(p),
+            "type":   POI.loc[p, "type"],
+            "score":  round(POI.loc[p, score_col], 3),
+            "cluster": POI.loc[p, "cluster"] if "cluster" in POI.columns else None,
+            "cum_walk_s": cum,
+        })
+    return pd.DataFrame(rows_out), stats
+
+
+def load_city_matrix(city: str):
+    """(matrice in mmap, URI→indice) della città; esce se la matrice manca."""
+    from matrix.matrix_store import load_matrix, load_index
+    mat = DATA / f"distance_matrix_{city.lower()}.npy"
+    if not mat.exists():
+        sys.exit(f"💥  Matrice mancante: {mat}")
+    return load_matrix(mat), load_index(mat, DATA / f"poi_{city.lower()}_cluster.csv")
+
+
+def main():
+    par = argparse.ArgumentParser(description="Selezione CP-SAT dei POI del tour")
+    par.add_argument("city", nargs="?", default="Rome")
+    par.add_argument("--decompose", action="store_true",
+                     help="Un sotto-problema per cluster + master sugli slot")
+    par.add_argument("--pairs", action="store_true",
+                     help="Con --decompose: anche coppie di cluster vicini (serve la matrice)")
+    par.add_argument("--workers", type=int, default=None)
+    par.add_argument("--joint", action="store_true",
+                     help="Selezione + ordinamento in un solo modello (scrive anche la route)")
+    par.add_argument("--walk-weight", type=float, default=WALK_W,
+                     help="Con --joint: penalità per minuto di cammino (score×100)")
+    par.add_argument("--cache", action="store_true",
+                     help="Riusa i tour già calcolati per input equivalenti (data/tour_cache/)")
+    args = par.parse_args()
+    CITY = args.city
+    tm.setup("solver_csp")
+    POI = load_poi(CITY)
+    use_matrix = args.joint or (args.decompose and args.pairs)
+
+    def solve():
+        route = None
+        if args.joint:
+            D, uri2idx = load_city_matrix(CITY)
+            route, stats = solve_joint(POI, D, uri2idx, walk_w=args.walk_weight)
+            tour = None if route is None else route.drop(columns="cum_walk_s")
+        elif args.decompose:
+            D = uri2idx = None
+            if args.pairs:
+                D, uri2idx = load_city_matrix(CITY)
+            tour, stats = solve_decomposed(POI, D=D, uri2idx=uri2idx, workers=args.workers)
+        else:
+            tour, stats = solve_day(POI)
+        return tour, route, stats
+
+    cached = False
+    if args.cache:
+        from solver.tour_cache import TourCache, data_version, fingerprint, rescore
+        cache = TourCache(disk_dir=DATA / "tour_cache")
+        mat = DATA / f"distance_matrix_{CITY.lower()}.npy"
+        key = fingerprint(data_version(POI, mat if use_matrix else None), POI["score"],
+                          START_H, END_H, mode="joint" if args.joint else
+                          "decompose" if args.decompose else "csp",
+                          pairs=args.pairs, walk_w=args.walk_weight if args.joint else None)
+        tour, route, stats = cache.get_or_solve(
+            key, solve, cacheable=lambda r: r[2]["status"] in ("OPTIMAL", "FEASIBLE", "INFEASIBLE"))
+        for name, val in cache.stats().items():
+            tm.gauge(f"cache.{name}", val)
+        if cache.misses == 0:
+            # score quantizzati nella chiave: si rileggono quelli correnti;
+            # le statistiche CP-SAT sono quelle della risoluzione originale
+            cached = True
+            tour, route = rescore(tour, POI), rescore(route, POI)
+            stats = dict(stats, cached=True)
+            print("♻️  tour ripreso dalla cache")
+    else:
+        tour, route, stats = solve()
+
+    stats = dict(stats)
+    sub_s, build_s = stats.pop("sub_s", None), stats.pop("build_s")
+    if not cached:                                  # tempi solo per risoluzioni fresche
+        if sub_s is not None:
+            tm.observe("cpsat.sub_s", sub_s)
+            tm.gauge("cpsat.groups", stats["n_groups"])
+        tm.observe("cpsat.build_s", build_s)
+    tm.event("cpsat", **stats)
+    if tour is None:
+        sys.exit("⚠️  Nessuna soluzione trovata")
+
+    # ─────────────────────────── export tour
+    out = DATA / f"tour_{CITY.lower()}.csv"
+    tour.to_csv(out, index=False, encoding="utf-8")
+    print("✅  tour salvato →", out.relative_to(Path.cwd()))
+    if route is not None:
+        out = DATA / f"route_{CITY.lower()}.csv"
+        route.to_csv(out, index=False, encoding="utf-8")
+        print("✅  route salvata →", out.relative_to(Path.cwd()),
+              f"  (cammino {route['cum_walk_s'].iloc[-1] / 60:.0f} min)")
+
+
+if __name__ == "__main__":
+    main()
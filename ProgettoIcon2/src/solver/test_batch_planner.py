@@ -0,0 +1,67 @@
+"""Job del batch planner: colonne facoltative e piani su più giorni."""
+import sys
+
+import pandas as pd
+import pytest
+
+import batch_planner as bp
+from solver.astar_order import order_tour
+
+
+def _init(city, cache_size=0):
+    poi, D, uri2idx = city
+    bp._init_worker({"Test": (poi, D, uri2idx, "v1")}, 2.0, 1, cache_size)
+    return poi
+
+
+def test_blank_optional_cells(tmp_path, make_city):
+    f = tmp_path / "jobs.csv"
+    f.write_text("user,city,date,start_h,end_h,days,score_col\n"
+                 "ann,Test,2025-05-01,9,12,,\n"
+                 "bob,Test,2025-05-01,9,12,2,\n")
+    jobs = bp.load_jobs(f)
+    assert list(jobs["days"]) == [1, 2]
+    assert list(jobs["score_col"]) == ["", ""]
+
+    poi = _init(make_city(30))
+    job = jobs.assign(job_id=range(len(jobs))).to_dict("records")
+    routes, log = bp.plan_job(job[0])
+    assert [l["day"] for l in log] == [0] and len(routes[0]) == 3
+    assert bp.score_column(poi, job[0]) == "score"
+    assert bp.score_column(poi, job[1]) == "score_bob"
+
+
+def test_days_without_column(tmp_path):
+    f = tmp_path / "jobs.csv"
+    f.write_text("user,city,date,start_h,end_h\nann,Test,2025-05-01,9,12\n")
+    assert list(bp.load_jobs(f)["days"]) == [1]
+
+
+def test_multi_day_excludes_used_poi(make_city):
+    _init(make_city(30), cache_size=16)
+    job = dict(job_id=0, user="ann", city="Test", date="2025-05-01", start_h=9, end_h=13, days=3)
+    routes, log = bp.plan_job(job)
+    uris = pd.concat(routes)["uri"]
+    assert len(routes) == 3 and not uris.duplicated().any()
+    assert [r["date"].iloc[0] for r in routes] == ["2025-05-01", "2025-05-02", "2025-05-03"]
+    assert not any(l["cached"] for l in log)
+
+
+def test_nan_days_in_record(city):
+    _init(city)
+    job = dict(job_id=0, user="ann", city="Test", date="2025-05-01", start_h=9, end_h=11,
+               days=float("nan"))
+    routes, log = bp.plan_job(job)
+    assert len(log) == 1
+
+
+def test_empty_or_unknown_tour_is_value_error(city):
+    poi, D, uri2idx = city
+    for tour in (poi.iloc[:0], poi.iloc[:2].assign(uri=["x", "y"])):
+        with pytest.raises(ValueError):
+            order_tour(tour, D, uri2idx)
+
+
+def test_single_module_copy():
+    assert "solver.solver_csp" in sys.modules
+    assert bp.solve_day is sys.modules["solver.solver_csp"].solve_day
@@ -0,0 +1,40 @@
+"""Slot della ri-pianificazione: route in ordine di cammino, non di slot."""
+import numpy as np
+import pandas as pd
+
+from replan import replan, slot_h
+from solver_csp import END_H
+
+
+def _route(POI, hours):
+    """Route in ordine di cammino con gli slot ``hours`` (non ordinati)."""
+    return pd.DataFrame({"slot": [f"{h:02d}:00–{h + 1:02d}:00" for h in hours],
+                         "uri": POI["uri"][:len(hours)].to_numpy(),
+                         "cum_walk_s": np.arange(len(hours)) * 300.0})
+
+
+def test_new_slots_follow_prefix_max_slot(city):
+    POI, D, uri2idx = city
+    route = _route(POI, [9, 10, 14, 11, 15])              # l'A* ha messo le 14 prima delle 11
+    out, stats = replan(POI, D, uri2idx, route, visited=3)
+    hours = out["slot"].map(slot_h)
+    assert not hours.duplicated().any()
+    assert list(out["uri"][:3]) == list(route["uri"][:3])
+    assert (hours[3:] > 14).all()
+    assert len(out) - 3 == END_H - 15
+
+
+def test_now_h_cannot_reuse_prefix_slots(city):
+    POI, D, uri2idx = city
+    route = _route(POI, [9, 13, 10])
+    out, _ = replan(POI, D, uri2idx, route, visited=2, now_h=10)
+    hours = out["slot"].map(slot_h)
+    assert not hours.duplicated().any()
+    assert (hours[2:] >= 14).all()
+
+
+def test_no_prefix_starts_at_opening(city):
+    POI, D, uri2idx = city
+    out, stats = replan(POI, D, uri2idx, _route(POI, [9, 10]), visited=0)
+    assert stats["now_h"] == 9
+    assert sorted(out["slot"].map(slot_h)) == list(range(9, END_H))
@@ -0,0 +1,41 @@
+"""Parità fra motore vettoriale ed Experta di rule_check.py."""
+import pandas as pd
+import pytest
+
+from rule_check import check_routes, check_routes_experta
+
+pytest.importorskip("experta")
+
+
+def _route(types, cum, start=9, route_id=None):
+    df = pd.DataFrame({"slot": [f"{start + i:02d}:00–{start + i + 1:02d}:00" for i in range(len(types))],
+                       "type": types, "cum_walk_s": cum})
+    return df if route_id is None else df.assign(route_id=route_id)
+
+
+def _assert_parity(routes):
+    a, b = check_routes(routes), check_routes_experta(routes)
+    pd.testing.assert_frame_equal(a, b)
+    return a
+
+
+def test_parity_no_violations():
+    viol = _assert_parity(_route(["Museum", "Park"], [0.0, 300.0]))
+    assert viol.empty
+
+
+def test_parity_with_violations():
+    routes = pd.concat([
+        _route(["Museum"] * 3 + ["ArchaeologicalSite"], [0, 100, 2200, 2300], start=13, route_id=1),
+        _route(["Park", "Museum"], [0, 60], route_id=2),
+    ], ignore_index=True)
+    viol = _assert_parity(routes)
+    assert set(viol["rule"]) == {"triple_same_type", "long_walk", "archeo_late"}
+    assert (viol["route_id"] == 1).all()
+
+
+def test_parity_string_route_ids():
+    routes = pd.concat([_route(["Park", "Park", "Park"], [0, 10, 20], route_id="a"),
+                        _route(["Museum"], [0], route_id="b")], ignore_index=True)
+    viol = _assert_parity(routes)
+    assert list(viol["route_id"]) == ["a"]
@@ -0,0 +1,60 @@
+"""``score_col`` (il tour riporta lo score ottimizzato) e decomposizione per cluster."""
+import numpy as np
+import pytest
+
+from solver_csp import solve_day, solve_joint, solve_decomposed
+from replan import replan
+
+
+def _flat(poi):
+    """``score`` costante: solo ``score_bob`` distingue i POI."""
+    return poi.assign(score=0.5)
+
+
+def _check(poi, tour):
+    assert len(tour)
+    expected = poi.set_index("uri").loc[tour["uri"], "score_bob"].to_numpy()
+    assert np.allclose(tour["score"], expected)
+    assert not np.allclose(tour["score"], 0.5)
+
+
+def test_solve_day_score_col(city):
+    poi = _flat(city[0])
+    tour, _ = solve_day(poi, 9, 13, "score_bob", time_limit=2)
+    _check(poi, tour)
+    assert np.isclose(tour["score"].sum(), poi["score_bob"].nlargest(4).sum())
+
+
+def test_solve_joint_score_col(city):
+    poi, D, uri2idx = city
+    poi = _flat(poi)
+    route, _ = solve_joint(poi, D, uri2idx, 9, 13, "score_bob", time_limit=5)
+    _check(poi, route)
+
+
+def test_replan_score_col(city):
+    poi, D, uri2idx = city
+    poi = _flat(poi)
+    route, _ = solve_day(poi, 9, 14, "score_bob", time_limit=2)
+    route = route.assign(cum_walk_s=0.0)
+    out, _ = replan(poi, D, uri2idx, route, visited=2, score_col="score_bob")
+    _check(poi, out)
+
+
+@pytest.mark.parametrize("pairs", [False, True])
+def test_decomposed_matches_monolithic(make_city, pairs):
+    poi, D, uri2idx = make_city(48, seed=5, n_clusters=4)
+    mono, _ = solve_day(poi, 9, 15, time_limit=5)
+    kw = dict(D=D, uri2idx=uri2idx, adj_s=1e9) if pairs else {}
+    dec, stats = solve_decomposed(poi, 9, 15, time_limit=5, workers=1, **kw)
+    assert stats["n_groups"] == (4 + 6 if pairs else 4)
+    assert len(dec) == len(mono) == 6
+    assert np.isclose(dec["score"].sum(), mono["score"].sum())
+
+
+def test_decomposed_empty(make_city):
+    poi, _, _ = make_city(4)
+    tour, stats = solve_decomposed(poi.iloc[:0], workers=1)
+    empty, _ = solve_day(poi.iloc[:0])
+    assert len(tour) == len(empty) == 0
+    assert stats["n_groups"] == 0 and stats["sub_max_poi"] == 0
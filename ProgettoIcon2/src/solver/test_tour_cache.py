@@ -0,0 +1,90 @@
+"""TourCache: LRU, livello su disco, potatura e chiavi."""
+import os
+import pickle
+
+import pandas as pd
+
+import tour_cache as tc
+from tour_cache import TourCache, data_version, fingerprint, rescore
+
+
+def test_lru_eviction():
+    c = TourCache(2)
+    c.put("a", 1)
+    c.put("b", 2)
+    assert c.get("a") == 1                       # "a" diventa la più recente
+    c.put("c", 3)
+    assert c.get("b") is None and c.get("a") == 1 and c.get("c") == 3
+    assert c.stats()["evictions"] == 1
+
+
+def test_disk_round_trip(tmp_path):
+    TourCache(4, tmp_path).put("k", {"tour": [1, 2]})
+    other = TourCache(4, tmp_path)               # altro processo / esecuzione
+    assert other.get("k") == {"tour": [1, 2]}
+    assert other.stats()["disk_hits"] == 1 and other.get("k") == {"tour": [1, 2]}
+    assert other.stats()["hits"] == 1
+
+
+def test_atomic_write_leaves_no_tmp(tmp_path):
+    c = TourCache(4, tmp_path)
+    c.put("k", "v")
+    assert [f.name for f in tmp_path.iterdir()] == ["k.pkl"]
+    (tmp_path / "rotto.pkl").write_bytes(pickle.dumps("v")[:3])  # scrittura troncata
+    assert TourCache(4, tmp_path).get("rotto", "miss") == "miss"
+
+
+def test_prune_in_batches(tmp_path, monkeypatch):
+    c = TourCache(1, tmp_path, disk_max=10)
+    calls = []
+    prune = c._prune
+    monkeypatch.setattr(c, "_prune", lambda: (calls.append(1), prune()))
+    for i in range(25):
+        c.put(f"k{i:02d}", i)
+        os.utime(tmp_path / f"k{i:02d}.pkl", ns=(i * 10**9, i * 10**9))
+    files = sorted(f.stem for f in tmp_path.glob("*.pkl"))
+    assert len(files) <= 10 and files[-1] == "k24"
+    assert len(calls) < 25 - 10                  # non a ogni put
+    assert "k00" not in files                    # via i meno usati
+
+
+def test_prune_tolerates_concurrent_unlink(tmp_path, monkeypatch):
+    c = TourCache(1, tmp_path, disk_max=3)
+    for i in range(3):
+        c.put(f"k{i}", i)
+    real_stat = type(tmp_path).stat
+
+    def flaky(self, *a, **kw):
+        if self.name == "k1.pkl":
+            self.unlink(missing_ok=True)         # un altro processo l'ha appena potato
+            raise FileNotFoundError(self)
+        return real_stat(self, *a, **kw)
+    monkeypatch.setattr(type(tmp_path), "stat", flaky)
+    c.put("k3", 3)                               # supera disk_max → _prune
+    assert "k1.pkl" not in os.listdir(tmp_path) and "k3.pkl" in os.listdir(tmp_path)
+
+
+def test_cacheable_filter():
+    c = TourCache(4)
+    assert c.get_or_solve("x", lambda: "TIMEOUT", cacheable=lambda v: v != "TIMEOUT") == "TIMEOUT"
+    assert c.get_or_solve("x", lambda: "OPTIMAL", cacheable=lambda v: v != "TIMEOUT") == "OPTIMAL"
+    assert c.get_or_solve("x", lambda: "mai chiamata") == "OPTIMAL"
+    assert c.stats()["misses"] == 2 and c.stats()["hits"] == 1
+
+
+def test_keys(city):
+    poi = city[0].assign(score=city[0]["score"].round(2))
+    v = data_version(poi)
+    assert data_version(poi.assign(cluster=poi["cluster"] + 1)) != v
+    assert data_version(poi.assign(label="x")) != v
+    k = fingerprint(v, poi["score"], 9, 18, mode="csp")
+    assert fingerprint(v, poi["score"] + tc.SCORE_Q / 10, 9, 18, mode="csp") == k
+    assert fingerprint(v, poi["score"], 9, 18, mode="joint") != k
+
+
+def test_rescore(city):
+    poi = city[0]
+    tour = poi.iloc[:3][["uri", "score"]].assign(score=0.0)
+    out = rescore(tour, poi, "score_bob")
+    assert list(out["score"]) == list(poi["score_bob"].iloc[:3])
+    assert rescore(None, poi) is None
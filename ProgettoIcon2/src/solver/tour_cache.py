@@ -0,0 +1,156 @@
+"""Cache dei risultati del solver, indicizzata dall'impronta degli input.
+
+Molti utenti di una città hanno vettori di score quasi uguali e gli stessi
+vincoli: invece di rilanciare CP-SAT (+ A*) si riusa il tour già calcolato.
+
+Chiave (``fingerprint``) = hash di
+• versione dei dati della città (URI, etichette, tipi, orari e cluster dei
+  POI; matrice se usata)
+• vettore di score quantizzato a passi di ``SCORE_Q``
+• START_H / END_H e vincoli della richiesta (modalità, POI esclusi, …)
+
+``TourCache`` è un LRU in memoria limitato a ``maxsize`` voci, con un livello
+opzionale su disco (una pickle per chiave in ``disk_dir``) condivisibile fra
+processi: scritture atomiche e, oltre ``disk_max`` file, potatura a blocchi
+fino a ``PRUNE_TO`` × ``disk_max`` (i meno usati di recente; i file già rimossi
+da un altro processo si ignorano). ``stats()`` riporta hit/miss.
+
+Gli score del tour in cache sono quelli (quantizzati) di chi l'ha calcolato:
+``rescore`` li riallinea alla richiesta corrente.
+
+Esempio:
+    cache = TourCache(256, DATA / "tour_cache")
+    key = fingerprint(data_version(POI), POI["score"], 9, 18, mode="csp")
+    tour = cache.get_or_solve(key, lambda: solve_day(POI)[0])
+"""
+from __future__ import annotations
+
+import hashlib, json, os, pickle
+from collections import OrderedDict
+from pathlib import Path
+import numpy as np
+import pandas as pd
+
+SCORE_Q = 0.01          # passo di quantizzazione degli score
+PRUNE_TO = 0.9          # la potatura scende a questa frazione di disk_max
+_MISSING = object()
+
+
+def data_version(POI: pd.DataFrame, matrix: Path | None = None) -> str:
+    """Impronta dei dati "statici" della città (non degli score)."""
+    cols = [c for c in ("uri", "label", "type", "open", "close", "cluster") if c in POI.columns]
+    h = hashlib.sha1(pd.util.hash_pandas_object(POI[cols], index=True).to_numpy().tobytes())
+    if matrix is not None and Path(matrix).exists():
+        st = Path(matrix).stat()
+        h.update(f"{st.st_size}:{st.st_mtime_ns}".encode())
+    return h.hexdigest()[:16]
+
+
+def fingerprint(version: str, scores, start_h: int, end_h: int, q: float = SCORE_Q,
+                **constraints) -> str:
+    """Chiave della richiesta; ``constraints`` deve essere serializzabile in JSON
+    (insiemi → liste ordinate)."""
+    qs = np.round(np.nan_to_num(np.asarray(scores, dtype=float)) / q).astype(np.int32)
+    cons = {k: sorted(v) if isinstance(v, (set, frozenset)) else v for k, v in constraints.items()}
+    h = hashlib.sha1(f"{version}|{start_h}|{end_h}|{q}|".encode())
+    h.update(qs.tobytes())
+    h.update(json.dumps(cons, sort_keys=True, default=str).encode())
+    return h.hexdigest()
+
+
+def rescore(tour: pd.DataFrame | None, POI: pd.DataFrame, score_col: str = "score"):
+    """Tour in cache con la colonna ``score`` riletta da ``POI[score_col]``."""
+    if tour is None or not len(tour):
+        return tour
+    scores = POI.set_index("uri")[score_col]
+    return tour.assign(score=tour["uri"].map(scores).round(3).to_numpy())
+
+
+class TourCache:
+    """LRU in memoria + livello opzionale su disco."""
+
+    def __init__(self, maxsize: int = 256, disk_dir: Path | None = None, disk_max: int = 10_000):
+        self.maxsize, self.disk_max = maxsize, disk_max
+        self.disk_dir = Path(disk_dir) if disk_dir else None
+        self._disk_n = 0                                    # file su disco (stima, vedi _prune)
+        if self.disk_dir:
+            self.disk_dir.mkdir(parents=True, exist_ok=True)
+            self._disk_n = sum(1 for _ in self.disk_dir.glob("*.pkl"))
+        self._mem: OrderedDict[str, object] = OrderedDict()
+        self.hits = self.disk_hits = self.misses = self.evictions = 0
+
+    # ---------- livelli ----------
+    def _file(self, key: str) -> Path:
+        return self.disk_dir / f"{key}.pkl"
+
+    def _remember(self, key: str, value) -> None:
+        self._mem[key] = value
+        self._mem.move_to_end(key)
+        while len(self._mem) > self.maxsize:
+            self._mem.popitem(last=False)
+            self.evictions += 1
+
+    def get(self, key: str, default=None):
+        if key in self._mem:
+            self._mem.move_to_end(key)
+            self.hits += 1
+            return self._mem[key]
+        if self.disk_dir:
+            f = self._file(key)
+            try:
+                value = pickle.loads(f.read_bytes())
+            except (OSError, pickle.UnpicklingError, EOFError):
+                pass
+            else:
+                try:
+                    os.utime(f)                             # "usato di recente" per la potatura
+                except OSError:
+                    pass                                    # già potato da un altro processo
+                self.disk_hits += 1
+                self._remember(key, value)
+                return value
+        self.misses += 1
+        return default
+
+    def put(self, key: str, value) -> None:
+        self._remember(key, value)
+        if self.disk_dir:
+            f = self._file(key)
+            new = not f.exists()
+            tmp = f.with_suffix(f".{os.getpid()}.tmp")
+            tmp.write_bytes(pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL))
+            os.replace(tmp, f)                              # atomico fra processi
+            self._disk_n += new
+            if self._disk_n > self.disk_max:
+                self._prune()
+
+    def _prune(self) -> None:
+        """Rimuove i file meno usati fino a PRUNE_TO × disk_max. Si scorre la
+        cartella solo quando la stima locale supera disk_max (i file scritti da
+        altri processi si contano qui): il costo per ``put`` resta O(1) ammortizzato."""
+        files = []
+        for f in self.disk_dir.glob("*.pkl"):
+            try:
+                files.append((f.stat().st_mtime, f))
+            except FileNotFoundError:                       # rimosso da un altro processo
+                pass
+        target = int(self.disk_max * PRUNE_TO)
+        files.sort(key=lambda mf: mf[0])
+        for _, f in files[:max(0, len(files) - target)]:
+            f.unlink(missing_ok=True)
+        self._disk_n = min(len(files), target)
+
+    def get_or_solve(self, key: str, solve, cacheable=lambda value: True):
+        """Valore in cache oppure ``solve()`` (salvato solo se ``cacheable``)."""
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            value = solve()
+            if cacheable(value):
+                self.put(key, value)
+        return value
+
+    def stats(self) -> dict:
+        total = self.hits + self.disk_hits + self.misses
+        return dict(hits=self.hits, disk_hits=self.disk_hits, misses=self.misses,
+                    evictions=self.evictions, size=len(self._mem),
+                    hit_rate=(self.hits + self.disk_hits) / total if total else 0.0)
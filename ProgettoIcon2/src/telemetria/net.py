@@ -0,0 +1,88 @@
+"""Retry strumentato per gli stadi di rete (OSRM, Wikipedia, SPARQL).
+
+Si ritentano solo errori di rete/timeout, 429 e 5xx, con backoff esponenziale;
+gli altri 4xx (es. 404 di Wikipedia) tornano subito al chiamante. Ogni
+tentativo alimenta le metriche ``http.*`` di telemetry.py.
+
+Esempio:
+    r = net.get(url, "wikipedia", headers=HEADERS, timeout=8)
+    data = net.call(lambda: sparql.query().convert(), "sparql", net.urllib_status)
+"""
+from __future__ import annotations
+
+import asyncio, os, socket, time
+from urllib.error import HTTPError, URLError
+import requests
+
+from telemetria import telemetry as tm
+
+MAX_RETRY = 3          # tentativi totali
+BACKOFF_S = float(os.environ.get("SMARTTOUR_HTTP_BACKOFF", "1.0"))   # attesa base (× 2^tentativo)
+NOT_RETRYABLE = 0      # "status" degli errori che non dipendono dal server (URL errato, …)
+
+
+def retryable(status) -> bool:
+    """Errori di rete (status None), 429 e 5xx si ritentano; gli altri 4xx no."""
+    return status is None or status == 429 or status >= 500
+
+
+def call(fn, endpoint: str, status_of, retries: int = MAX_RETRY):
+    """``fn()`` con retry: ``status_of(exc)`` dà lo status HTTP dell'eccezione
+    (None = errore di rete). Rilancia l'ultima eccezione a tentativi esauriti."""
+    for attempt in range(retries):
+        try:
+            with tm.timer("http.latency_s", endpoint=endpoint):
+                return fn()
+        except Exception as exc:
+            status = status_of(exc)
+            tm.incr("http.errors", endpoint=endpoint, error=type(exc).__name__)
+            if attempt == retries - 1 or not retryable(status):
+                raise
+            tm.incr("http.retries", endpoint=endpoint)
+            time.sleep(BACKOFF_S * 2 ** attempt)
+
+
+async def acall(fn, endpoint: str, status_of, retries: int = MAX_RETRY):
+    """Come ``call`` per una coroutine ``fn()`` (backoff con asyncio.sleep)."""
+    for attempt in range(retries):
+        t0 = time.perf_counter()
+        try:
+            res = await fn()
+        except Exception as exc:
+            status = status_of(exc)
+            tm.incr("http.errors", endpoint=endpoint, error=type(exc).__name__)
+            if attempt == retries - 1 or not retryable(status):
+                raise
+            tm.incr("http.retries", endpoint=endpoint)
+            await asyncio.sleep(BACKOFF_S * 2 ** attempt)
+        else:
+            tm.observe("http.latency_s", time.perf_counter() - t0, endpoint=endpoint)
+            return res
+
+
+def requests_status(exc):
+    if getattr(exc, "response", None) is not None:
+        return exc.response.status_code
+    if isinstance(exc, (requests.ConnectionError, requests.Timeout)):
+        return None
+    return NOT_RETRYABLE
+
+
+def urllib_status(exc):
+    if isinstance(exc, HTTPError):
+        return exc.code
+    if isinstance(exc, (URLError, socket.timeout, ConnectionError)):
+        return None
+    return NOT_RETRYABLE
+
+
+def get(url: str, endpoint: str, **kw):
+    """``requests.get`` con retry; le risposte 429/5xx contano come errori.
+    Restituisce la risposta (anche un 4xx non ritentabile)."""
+    def once():
+        r = requests.get(url, **kw)
+        tm.incr("http.requests", endpoint=endpoint, status=r.status_code)
+        if retryable(r.status_code):
+            r.raise_for_status()
+        return r
+    return call(once, endpoint, requests_status)
@@ -0,0 +1,133 @@
+"""Telemetria condivisa fra gli stadi della pipeline.
+
+Contatori, gauge, istogrammi (anche come timer) ed eventi strutturati,
+raccolti in memoria ed emessi come JSON-lines all'uscita del processo.
+
+Uso negli script (l'unica riga di bootstrap: uno script lanciato come
+``python src/<cartella>/x.py`` vede solo la propria cartella, quindi si
+aggiunge src/ e da lì si importano i pacchetti condivisi – telemetria,
+matrix, solver – come fa src/conftest.py per i test):
+    sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+    from telemetria import telemetry as tm
+
+    tm.setup("solver_csp")
+    with tm.timer("cpsat.solve"):
+        ...
+    tm.incr("http.errors", endpoint="osrm")
+    tm.event("cpsat", status="OPTIMAL", gap=0.0)
+
+Attivazione (variabili d'ambiente, nessun costo se assenti):
+    SMARTTOUR_METRICS=path.jsonl   → append delle metriche ("-" = stderr)
+    SMARTTOUR_PROFILE=dir          → cProfile + tracemalloc; all'uscita salva
+                                     dir/<stage>.prof e dir/<stage>_mem.txt
+"""
+from __future__ import annotations
+
+import atexit, cProfile, json, os, sys, time, tracemalloc, uuid
+from contextlib import contextmanager
+from pathlib import Path
+import numpy as np
+
+_STAGE = None
+_RUN_ID = uuid.uuid4().hex[:12]
+_COUNTERS: dict[tuple, float] = {}
+_GAUGES: dict[tuple, float] = {}
+_HISTS: dict[tuple, list[float]] = {}
+_EVENTS: list[dict] = []
+_PROFILER = None
+_T0 = time.perf_counter()
+
+
+def _key(name: str, tags: dict) -> tuple:
+    return (name, tuple(sorted(tags.items())))
+
+
+# ---------- API ----------
+def setup(stage: str) -> None:
+    """Da chiamare una volta a inizio script; registra l'emissione all'uscita."""
+    global _STAGE, _PROFILER
+    if _STAGE is not None:
+        return
+    _STAGE = stage
+    if os.environ.get("SMARTTOUR_PROFILE"):
+        tracemalloc.start(10)
+        _PROFILER = cProfile.Profile()
+        _PROFILER.enable()
+    atexit.register(flush)
+
+
+def incr(name: str, value: float = 1, **tags) -> None:
+    k = _key(name, tags)
+    _COUNTERS[k] = _COUNTERS.get(k, 0) + value
+
+
+def gauge(name: str, value: float, **tags) -> None:
+    _GAUGES[_key(name, tags)] = value
+
+
+def observe(name: str, value: float, **tags) -> None:
+    _HISTS.setdefault(_key(name, tags), []).append(float(value))
+
+
+@contextmanager
+def timer(name: str, **tags):
+    """Misura la durata del blocco (secondi) nell'istogramma ``name``."""
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(name, time.perf_counter() - t0, **tags)
+
+
+def event(name: str, **fields) -> None:
+    """Record puntuale (es. statistiche finali di un solver)."""
+    _EVENTS.append(dict(name=name, **fields))
+
+
+# ---------- emissione ----------
+def _summary(vals: list[float]) -> dict:
+    a = np.asarray(vals)
+    p50, p95, p99 = np.percentile(a, [50, 95, 99])
+    return dict(count=len(a), sum=float(a.sum()), min=float(a.min()), max=float(a.max()),
+                mean=float(a.mean()), p50=float(p50), p95=float(p95), p99=float(p99))
+
+
+def records() -> list[dict]:
+    """Tutte le metriche raccolte finora come lista di dict."""
+    base = dict(ts=time.time(), stage=_STAGE, run_id=_RUN_ID)
+    out = [dict(base, kind="counter", name=n, tags=dict(t), value=v) for (n, t), v in _COUNTERS.items()]
+    out += [dict(base, kind="gauge", name=n, tags=dict(t), value=v) for (n, t), v in _GAUGES.items()]
+    out += [dict(base, kind="histogram", name=n, tags=dict(t), **_summary(v))
+            for (n, t), v in _HISTS.items()]
+    out += [dict(base, kind="event", **e) for e in _EVENTS]
+    out.append(dict(base, kind="gauge", name="stage.wall_s", tags={},
+                    value=time.perf_counter() - _T0))
+    return out
+
+
+def _dump_profile(recs: list[dict]) -> None:
+    out_dir = Path(os.environ["SMARTTOUR_PROFILE"])
+    out_dir.mkdir(parents=True, exist_ok=True)
+    _PROFILER.disable()
+    _PROFILER.dump_stats(out_dir / f"{_STAGE}.prof")
+    snap = tracemalloc.take_snapshot()
+    _, peak = tracemalloc.get_traced_memory()
+    top = snap.statistics("lineno")[:25]
+    (out_dir / f"{_STAGE}_mem.txt").write_text("\n".join(str(s) for s in top) + "\n")
+    recs.append(dict(recs[-1], name="mem.py_peak_mb", value=peak / 2**20))
+
+
+def flush() -> None:
+    """Scrive le metriche in SMARTTOUR_METRICS (se impostata)."""
+    recs = records()
+    if _PROFILER is not None:
+        _dump_profile(recs)
+    dest = os.environ.get("SMARTTOUR_METRICS")
+    if not dest:
+        return
+    lines = "".join(json.dumps(r, ensure_ascii=False, default=str) + "\n" for r in recs)
+    if dest == "-":
+        sys.stderr.write(lines)
+    else:
+        with open(dest, "a", encoding="utf-8") as fh:
+            fh.write(lines)
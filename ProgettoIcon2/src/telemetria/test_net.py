@@ -0,0 +1,87 @@
+"""Retry condiviso degli stadi di rete."""
+import asyncio
+from urllib.error import HTTPError, URLError
+
+import pytest
+import requests
+
+import telemetria.net as net
+from telemetria import telemetry as tm
+
+
+class _Resp:
+    def __init__(self, status):
+        self.status_code = status
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise requests.HTTPError(response=self)
+
+
+@pytest.fixture
+def fake_get(monkeypatch):
+    monkeypatch.setattr(net, "BACKOFF_S", 0.0)
+    calls = []
+
+    def install(*outcomes):
+        it = iter(outcomes)
+
+        def get(url, **kw):
+            calls.append(url)
+            o = next(it)
+            if isinstance(o, Exception):
+                raise o
+            return _Resp(o)
+        monkeypatch.setattr(net.requests, "get", get)
+        return calls
+    return install
+
+
+def _retries(endpoint):
+    return tm._COUNTERS.get(tm._key("http.retries", {"endpoint": endpoint}), 0)
+
+
+def test_retries_429_5xx_and_network(fake_get):
+    calls = fake_get(503, requests.ConnectionError(), 200)
+    before = _retries("t1")
+    assert net.get("u", "t1").status_code == 200
+    assert len(calls) == 3 and _retries("t1") - before == 2
+
+
+def test_404_returns_without_retry(fake_get):
+    calls = fake_get(404)
+    assert net.get("u", "t2").status_code == 404
+    assert len(calls) == 1
+
+
+def test_gives_up_after_max_retry(fake_get):
+    calls = fake_get(*[429] * net.MAX_RETRY)
+    with pytest.raises(requests.HTTPError):
+        net.get("u", "t3")
+    assert len(calls) == net.MAX_RETRY
+
+
+def test_client_errors_are_not_retried(fake_get):
+    calls = fake_get(requests.exceptions.InvalidURL())
+    with pytest.raises(requests.exceptions.InvalidURL):
+        net.get("u", "t4")
+    assert len(calls) == 1
+
+
+def test_urllib_status():
+    assert net.urllib_status(HTTPError("u", 502, "", {}, None)) == 502
+    assert net.urllib_status(URLError("down")) is None
+    assert not net.retryable(net.urllib_status(ValueError()))
+
+
+def test_acall(monkeypatch):
+    monkeypatch.setattr(net, "BACKOFF_S", 0.0)
+    seen = []
+
+    async def once():
+        seen.append(1)
+        if len(seen) < 2:
+            raise RuntimeError(500)
+        return "ok"
+    status = lambda e: e.args[0]
+    assert asyncio.run(net.acall(once, "t5", status)) == "ok" and len(seen) == 2
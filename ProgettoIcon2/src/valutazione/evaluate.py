@@ -8,77 +8,199 @@ per tre strategie:
     3. CSP + A*  (il tuo tour finale)
 
 Genera anche uno scatter PNG `fig_quality_vs_time.png`.
+
+Con ``--mc N`` Random e Greedy non sono più un singolo punto ma distribuzioni
+di N route ciascuna (vedi montecarlo.py): si stampano media, IC 95%,
+percentili e la % di route delle baseline che il tour CSP+A* batte
+(tempo minore, score maggiore).
+
+Con ``--sweep`` si esplora invece l'intero compromesso qualità/tempo: la
+pipeline CSP + A* gira su una griglia budget di cammino × numero di slot
+(vedi pareto.py) e si salvano la frontiera di Pareto in
+``pareto_<city>.csv`` e ``fig_pareto_<city>.png``.
+
+Esempi:
+    python src/valutazione/evaluate.py Rome
+    python src/valutazione/evaluate.py Rome --mc 20000 --workers 8
+    python src/valutazione/evaluate.py Rome --sweep --budgets 30 60 90 --slots 4 6 9
 """
 from __future__ import annotations
 
-import sys, random
+import argparse, random, sys
 from pathlib import Path
 import numpy as np
 import pandas as pd
 import matplotlib.pyplot as plt
 
-CITY = sys.argv[1] if len(sys.argv) > 1 else "Rome"
-DATA = Path(__file__).resolve().parents[2] / "data"
-
-POI_FILE   = DATA / f"poi_{CITY.lower()}_scored.csv"
-MATRIX_FILE= DATA / f"distance_matrix_{CITY.lower()}.npy"
-ROUTE_FILE = DATA / f"route_{CITY.lower()}.csv"
-FIG_FILE   = DATA / "fig_quality_vs_time.png"
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from matrix.matrix_store import load_matrix, load_index, publish
+from solver.solver_csp import load_poi
+from montecarlo import simulate, summarize
+from pareto import sweep
 
-# --- load datasets ----------------------------------------------------------
-poi_df = pd.read_csv(POI_FILE)
-D      = np.load(MATRIX_FILE)
-route  = pd.read_csv(ROUTE_FILE)
-uri2idx = dict(zip(poi_df.uri, poi_df.index))
+DATA = Path(__file__).resolve().parents[2] / "data"
 
-k = len(route)
-sel_route_idx = [uri2idx[u] for u in route.uri]
 
 # --- helper to compute walk time -------------------------------------------
-def path_time(indices:list[int]) -> float:
+def path_time(D: np.ndarray, indices: list[int]) -> float:
     s=0
     for a,b in zip(indices[:-1],indices[1:]):
         d=D[a,b]
         s+= d if np.isfinite(d) else 0
     return s/60  # minutes
 
-# --- 1) CSP+A* --------------------------------------------------------------
-score_cspa = route.score.sum()
-time_cspa = path_time(sel_route_idx)
-
-# --- 2) GreedyScore ---------------------------------------------------------
-best_idx = poi_df.sort_values("score", ascending=False).head(k).index.tolist()
-# simple NN ordering
-ordered=[best_idx[0]]
-rem=set(best_idx[1:])
-while rem:
-    last=ordered[-1]
-    nxt=min(rem, key=lambda j: D[last,j] if np.isfinite(D[last,j]) else 1e9)
-    ordered.append(nxt); rem.remove(nxt)
-
-time_greedy = path_time(ordered)
-score_greedy= poi_df.loc[ordered,'score'].sum()
-
-# --- 3) Random --------------------------------------------------------------
-random_idx = random.sample(list(poi_df.index), k)
-time_rand  = path_time(random_idx)
-score_rand = poi_df.loc[random_idx,'score'].sum()
-
-# --- print summary ----------------------------------------------------------
-print("\nTempo (min)  |  Score")
-print("Random      {:>6.0f}   {:>6.1f}".format(time_rand, score_rand))
-print("GreedyScore {:>6.0f}   {:>6.1f}".format(time_greedy, score_greedy))
-print("CSP + A*    {:>6.0f}   {:>6.1f}".format(time_cspa, score_cspa))
-
-# --- scatter plot -----------------------------------------------------------
-plt.figure(figsize=(6,4))
-plt.scatter(time_rand, score_rand, label="Random", marker='x', s=80)
-plt.scatter(time_greedy, score_greedy, label="Greedy", marker='s', s=80)
-plt.scatter(time_cspa,  score_cspa,  label="CSP+A*", marker='o', s=80)
-plt.xlabel("Tempo di cammino (min)")
-plt.ylabel("Score totale")
-plt.title(f"Qualità vs Tempo – {CITY.capitalize()}")
-plt.legend()
-plt.tight_layout()
-plt.savefig(FIG_FILE, dpi=120)
-print("\n✅  Figura salvata →", FIG_FILE.relative_to(DATA.parent))
+
+def row_scores(poi_df: pd.DataFrame, uri2idx: dict, n_rows: int) -> np.ndarray:
+    """Score per riga della matrice (NaN per le righe senza POI valutato)."""
+    scores = np.full(n_rows, np.nan)
+    rows = poi_df["uri"].map(uri2idx)
+    ok = rows.notna()
+    scores[rows[ok].astype(int).to_numpy()] = poi_df.loc[ok, "score"].to_numpy(float)
+    return scores
+
+
+def single_draw(D, scores, k):
+    """Baseline storiche: un'estrazione Random e un Greedy deterministico.
+
+    ``scores`` è allineato alle righe di D (vedi ``row_scores``)."""
+    valid = np.flatnonzero(np.isfinite(scores))
+    # --- 2) GreedyScore ---------------------------------------------------------
+    best_idx = valid[np.argsort(-scores[valid], kind="stable")[:k]].tolist()
+    # simple NN ordering
+    ordered=[best_idx[0]]
+    rem=set(best_idx[1:])
+    while rem:
+        last=ordered[-1]
+        nxt=min(rem, key=lambda j: D[last,j] if np.isfinite(D[last,j]) else 1e9)
+        ordered.append(nxt); rem.remove(nxt)
+
+    time_greedy = path_time(D, ordered)
+    score_greedy= scores[ordered].sum()
+
+    # --- 3) Random --------------------------------------------------------------
+    random_idx = random.sample(valid.tolist(), k)
+    time_rand  = path_time(D, random_idx)
+    score_rand = scores[random_idx].sum()
+    return (time_rand, score_rand), (time_greedy, score_greedy)
+
+
+def main():
+    par = argparse.ArgumentParser(description="Valutazione qualità vs tempo del tour")
+    par.add_argument("city", nargs="?", default="Rome")
+    par.add_argument("--mc", type=int, default=0, metavar="N",
+                     help="Route campionate per baseline (0 = singola estrazione)")
+    par.add_argument("--pool", type=int, default=None,
+                     help="POI migliori fra cui campiona Greedy (default 2k)")
+    par.add_argument("--workers", type=int, default=None, help="Processi (default: tutti i core)")
+    par.add_argument("--seed", type=int, default=0)
+    par.add_argument("--shm", action="store_true",
+                     help="Condividi la matrice coi worker via shared memory invece di mmap")
+    par.add_argument("--sweep", action="store_true",
+                     help="Frontiera di Pareto su griglia budget × slot")
+    par.add_argument("--budgets", type=float, nargs="+",
+                     default=[15, 30, 45, 60, 90, 120, 150, 180, 240, 300],
+                     help="Budget di cammino (min) per --sweep")
+    par.add_argument("--slots", type=int, nargs="+", default=[3, 5, 6, 7, 9],
+                     help="Numero di slot orari per --sweep")
+    args = par.parse_args()
+    CITY = args.city
+
+    if args.sweep:
+        run_sweep(CITY, args)
+        return
+
+    POI_FILE   = DATA / f"poi_{CITY.lower()}_scored.csv"
+    MATRIX_FILE= DATA / f"distance_matrix_{CITY.lower()}.npy"
+    ROUTE_FILE = DATA / f"route_{CITY.lower()}.csv"
+    FIG_FILE   = DATA / "fig_quality_vs_time.png"
+
+    # --- load datasets ----------------------------------------------------------
+    poi_df = pd.read_csv(POI_FILE)
+    D      = load_matrix(MATRIX_FILE)
+    route  = pd.read_csv(ROUTE_FILE)
+    # righe della matrice dal sidecar: il CSV degli score può avere un altro ordine/lunghezza
+    uri2idx = load_index(MATRIX_FILE, DATA / f"poi_{CITY.lower()}_cluster.csv")
+    scores  = row_scores(poi_df, uri2idx, D.shape[0])
+
+    route = route[route.uri.isin(uri2idx)]
+    k = len(route)
+    if k == 0:
+        sys.exit("💥  Nessun POI della route presente nella matrice: niente da confrontare")
+    sel_route_idx = [uri2idx[u] for u in route.uri]
+
+    # --- 1) CSP+A* --------------------------------------------------------------
+    score_cspa = route.score.sum()
+    time_cspa = path_time(D, sel_route_idx)
+
+    plt.figure(figsize=(6,4))
+    if args.mc > 0:
+        src = publish(D) if args.shm else MATRIX_FILE
+        dist = simulate(src, scores, k, n=args.mc,
+                        pool=args.pool, workers=args.workers, seed=args.seed)
+        print(f"\nMonte-Carlo: {args.mc} route per baseline (k={k})")
+        print("             metrica |   media  [IC 95%]          p5    p50    p95 | CSP+A* (% battute)")
+        for name, (t, sc) in dist.items():
+            # tempo: meglio se minore; score: meglio se maggiore
+            for metric, vals, ref, up in (("Tempo", t, time_cspa, False),
+                                          ("Score", sc, score_cspa, True)):
+                s = summarize(vals, ref, higher_is_better=up)
+                print("{:<7} {:>12} | {:>7.1f} [{:>6.1f},{:>6.1f}] {:>6.1f} {:>6.1f} {:>6.1f} | "
+                      "{:>6.1f} ({:>5.1f})".format(name.capitalize(), metric, s["mean"], s["ci_lo"], s["ci_hi"],
+                                                  s["p5"], s["p50"], s["p95"], ref, s["rank_pct"]))
+        plt.scatter(*dist["random"], label="Random", marker='x', s=6, alpha=0.25)
+        plt.scatter(*dist["greedy"], label="Greedy", marker='s', s=6, alpha=0.25)
+    else:
+        (time_rand, score_rand), (time_greedy, score_greedy) = single_draw(D, scores, k)
+
+        # --- print summary ----------------------------------------------------------
+        print("\nTempo (min)  |  Score")
+        print("Random      {:>6.0f}   {:>6.1f}".format(time_rand, score_rand))
+        print("GreedyScore {:>6.0f}   {:>6.1f}".format(time_greedy, score_greedy))
+        print("CSP + A*    {:>6.0f}   {:>6.1f}".format(time_cspa, score_cspa))
+
+        # --- scatter plot -----------------------------------------------------------
+        plt.scatter(time_rand, score_rand, label="Random", marker='x', s=80)
+        plt.scatter(time_greedy, score_greedy, label="Greedy", marker='s', s=80)
+    plt.scatter(time_cspa,  score_cspa,  label="CSP+A*", marker='o', s=80)
+    plt.xlabel("Tempo di cammino (min)")
+    plt.ylabel("Score totale")
+    plt.title(f"Qualità vs Tempo – {CITY.capitalize()}")
+    plt.legend()
+    plt.tight_layout()
+    plt.savefig(FIG_FILE, dpi=120)
+    print("\n✅  Figura salvata →", FIG_FILE.relative_to(DATA.parent))
+
+
+def run_sweep(CITY: str, args):
+    MATRIX_FILE = DATA / f"distance_matrix_{CITY.lower()}.npy"
+    OUT_FILE    = DATA / f"pareto_{CITY.lower()}.csv"
+    FIG_FILE    = DATA / f"fig_pareto_{CITY.lower()}.png"
+
+    uri2idx = load_index(MATRIX_FILE, DATA / f"poi_{CITY.lower()}_cluster.csv")
+    src = publish(load_matrix(MATRIX_FILE)) if args.shm else MATRIX_FILE
+    df = sweep(load_poi(CITY), src, uri2idx, args.budgets, args.slots, workers=args.workers)
+    df.to_csv(OUT_FILE, index=False)
+
+    front = df[df["pareto"]].sort_values("walk_min")
+    print(f"\nFrontiera di Pareto ({len(front)} punti su {len(df)}):")
+    print("Budget (min) | Slot | Tempo (min) | Score")
+    for r in front.itertuples():
+        print(f"{r.budget_min:>12.0f} | {r.slots:>4} | {r.walk_min:>11.1f} | {r.score:>5.1f}")
+
+    ok = df[df["score"].notna()]
+    plt.figure(figsize=(6,4))
+    sc = plt.scatter(ok["walk_min"], ok["score"], c=ok["slots"], s=20, alpha=0.6, cmap="viridis")
+    plt.colorbar(sc, label="Slot")
+    plt.step(front["walk_min"], front["score"], where="post", color="black", label="Pareto")
+    plt.xlabel("Tempo di cammino (min)")
+    plt.ylabel("Score totale")
+    plt.title(f"Frontiera qualità/tempo – {CITY.capitalize()}")
+    plt.legend()
+    plt.tight_layout()
+    plt.savefig(FIG_FILE, dpi=120)
+    print(f"\n✅  Punti salvati → {OUT_FILE.relative_to(DATA.parent)}   "
+          f"figura → {FIG_FILE.relative_to(DATA.parent)}")
+
+
+if __name__ == "__main__":
+    main()
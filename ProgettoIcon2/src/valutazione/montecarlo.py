@@ -0,0 +1,148 @@
+"""RF12 – baseline Monte-Carlo per evaluate.py.
+
+Campiona migliaia di route Random e Greedy e ne calcola i costi in blocco:
+ogni batch è una matrice ``(n_route, k)`` di indici di riga di ``D``, i tratti
+sono estratti con fancy indexing ``D[idx[:, :-1], idx[:, 1:]]``.
+
+Le baseline:
+• Random – k POI distinti estratti uniformemente, nell'ordine di estrazione.
+• Greedy – k POI estratti dai ``pool`` migliori per score (lista ristretta
+  alla GRASP), ordinati col nearest-neighbour a partire da un POI casuale.
+  Con ``pool == k`` rimane solo la variabilità del punto di partenza.
+
+I batch sono distribuiti su più processi; ogni worker ha un seed derivato da
+``np.random.SeedSequence`` così i risultati sono riproducibili. La matrice
+arriva ai worker come "sorgente" di matrix_store.py (path → mmap, handle di
+shared memory) e non viene copiata in ciascuno.
+"""
+from __future__ import annotations
+
+import os, sys
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from matrix.matrix_store import open_shared
+
+_D = None
+_SCORES = None
+
+
+# ---------- costi vettoriali ----------
+def path_times(D: np.ndarray, idx: np.ndarray) -> np.ndarray:
+    """Tempo di cammino (min) di ogni route di ``idx`` (n, k); archi inf = 0."""
+    legs = D[idx[:, :-1], idx[:, 1:]].astype(float)
+    legs[~np.isfinite(legs)] = 0.0
+    return legs.sum(axis=1) / 60
+
+
+def sample_random(rng, n_poi: int, n: int, k: int) -> np.ndarray:
+    """n permutazioni parziali di lunghezza k (senza ripetizioni per riga).
+
+    Algoritmo di Floyd vettorizzato sulle righe: memoria O(n·k) invece di una
+    matrice (n, n_poi) di chiavi casuali."""
+    sel = np.empty((n, k), dtype=np.int64)
+    for i, j in enumerate(range(n_poi - k, n_poi)):
+        t = rng.integers(0, j + 1, n)
+        dup = (sel[:, :i] == t[:, None]).any(axis=1)
+        sel[:, i] = np.where(dup, j, t)
+    return rng.permuted(sel, axis=1)               # Floyd non mescola l'ordine
+
+
+def sample_greedy(rng, D: np.ndarray, best: np.ndarray, n: int, k: int) -> np.ndarray:
+    """k POI dalla lista ``best`` + ordinamento nearest-neighbour vettoriale."""
+    pick = sample_random(rng, len(best), n, k)
+    cand = best[pick]                                  # (n, k) indici in D
+    sub = D[cand[:, :, None], cand[:, None, :]].astype(float)
+    sub[~np.isfinite(sub)] = 1e9
+
+    rows = np.arange(n)
+    cur = rng.integers(0, k, n)
+    visited = np.zeros((n, k), bool)
+    order = np.empty((n, k), int)
+    for step in range(k):
+        order[:, step] = cur
+        visited[rows, cur] = True
+        if step == k - 1:
+            break
+        nxt = np.where(visited, np.inf, sub[rows, cur])
+        cur = nxt.argmin(axis=1)
+    return cand[rows[:, None], order]
+
+
+# ---------- worker ----------
+def _init_worker(src, scores):
+    global _D, _SCORES
+    _D, _SCORES = open_shared(src), scores
+
+
+def _run_batch(task):
+    kind, seed, n, k, pool = task
+    rng = np.random.default_rng(seed)
+    valid = np.flatnonzero(np.isfinite(_SCORES))       # righe di D con uno score
+    if kind == "random":
+        idx = valid[sample_random(rng, len(valid), n, k)]
+    else:
+        best = valid[np.argsort(-_SCORES[valid], kind="stable")[:pool]]
+        idx = sample_greedy(rng, _D, best, n, k)
+    return kind, path_times(_D, idx), _SCORES[idx].sum(axis=1)
+
+
+def simulate(D, scores: np.ndarray, k: int, n: int = 5000,
+             pool: int | None = None, workers: int | None = None,
+             batch: int = 1000, seed: int = 0) -> dict:
+    """Restituisce {"random": (tempi, score), "greedy": (tempi, score)}.
+
+    ``D`` è un array, il path di un .npy o un handle di ``matrix_store.publish``;
+    ``scores`` ha una voce per riga di D (NaN = riga esclusa dal campionamento)."""
+    n_rows = open_shared(D).shape[0]
+    if len(scores) != n_rows:
+        raise ValueError(f"{len(scores)} score per una matrice di {n_rows} righe")
+    n_valid = int(np.isfinite(scores).sum())
+    if k > n_valid:
+        raise ValueError(f"k={k} POI richiesti ma solo {n_valid} righe hanno uno score")
+    if k == 0:                                          # route vuote: nulla da campionare
+        zero = (np.zeros(n), np.zeros(n))
+        return {"random": zero, "greedy": zero}
+    pool = max(k, pool or 2 * k)
+    workers = workers or os.cpu_count() or 1
+    seeds = np.random.SeedSequence(seed).spawn(2 * (-(-n // batch)))
+    tasks, s = [], iter(seeds)
+    for kind in ("random", "greedy"):
+        for start in range(0, n, batch):
+            tasks.append((kind, next(s), min(batch, n - start), k, pool))
+
+    if workers == 1:
+        _init_worker(D, scores)
+        parts = list(map(_run_batch, tasks))
+    else:
+        with ProcessPoolExecutor(workers, initializer=_init_worker,
+                                 initargs=(D, scores)) as ex:
+            parts = list(ex.map(_run_batch, tasks))
+
+    res = {"random": ([], []), "greedy": ([], [])}
+    for kind, t, sc in parts:
+        res[kind][0].append(t); res[kind][1].append(sc)
+    return {kind: (np.concatenate(t), np.concatenate(sc)) for kind, (t, sc) in res.items()}
+
+
+# ---------- statistiche ----------
+def summarize(values: np.ndarray, ref: float | None = None,
+              higher_is_better: bool | None = None) -> dict:
+    """Media, IC 95% della media, percentili e (opz.) rango percentile di ``ref``.
+
+    ``rank_pct`` è la % di route campionate che ``ref`` batte: con
+    ``higher_is_better=False`` (tempo) quelle più lente, con ``True`` (score)
+    quelle con punteggio minore. La direzione va sempre indicata insieme a ``ref``."""
+    mean = float(values.mean())
+    half = 1.96 * float(values.std(ddof=1)) / np.sqrt(len(values)) if len(values) > 1 else 0.0
+    p5, p50, p95 = np.percentile(values, [5, 50, 95])
+    out = dict(mean=mean, ci_lo=mean - half, ci_hi=mean + half,
+               p5=float(p5), p50=float(p50), p95=float(p95))
+    if ref is not None:
+        if higher_is_better is None:
+            raise ValueError("summarize: con ref indicare higher_is_better")
+        beaten = values < ref if higher_is_better else values > ref
+        out["rank_pct"] = float(beaten.mean() * 100)
+    return out
@@ -0,0 +1,247 @@
+"""RF12 – sweep Pareto score / tempo di cammino per evaluate.py.
+
+Per ogni punto della griglia (budget di cammino × numero massimo di slot) si
+esegue la pipeline selezione CP-SAT + ordinamento A*:
+• il modello CP-SAT è compilato una volta per worker (``build_model`` sui
+  ``CANDIDATES`` POI migliori, su tutti gli slot della griglia) e clonato a
+  ogni punto: si aggiungono solo gli slot spenti e i tagli del budget
+• tagli "a coppie": due POI con min(D[i,j], D[j,i]) > budget non possono
+  stare nello stesso tour (la matrice non è simmetrica)
+• il cammino è quello dell'A* con partenza libera (nodo fittizio a costo 0)
+• dopo l'A*, se il tour supera il budget lo si riduce a un sottoinsieme
+  minimale ancora fuori budget e si aggiunge il taglio no-good (non tutti
+  quei POI insieme), poi si risolve di nuovo (al più ``MAX_ROUNDS`` volte)
+• incumbent: il migliore fra la singola tappa migliore (cammino 0), un tour
+  greedy a inserimento più economico da ogni POI (slot verificati con
+  CP-SAT) e il tour del punto precedente: ogni worker scorre gli slot di un
+  budget in ordine crescente, quindi quel tour resta valido. Si passa come
+  hint, si cercano solo tour migliori e, se non se ne trovano, si riporta lui:
+  lo score non cala mai al crescere degli slot
+• limite deterministico (``max_deterministic_time``, 1 thread, seed fisso):
+  il risultato non dipende dal carico della macchina
+La matrice arriva ai worker come sorgente di matrix_store.py (mmap / shm).
+"""
+from __future__ import annotations
+
+import os, sys
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+import numpy as np
+import pandas as pd
+from ortools.sat.python import cp_model
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from matrix.matrix_store import open_shared
+from solver.solver_csp import build_model, tour_rows, START_H
+from solver.astar_order import astar
+
+CANDIDATES = 120       # POI considerati nel modello template
+MAX_ROUNDS = 8         # risoluzioni per punto (tagli no-good dopo l'A*)
+GREEDY_TRY = 3         # insiemi greedy migliori di cui si verificano gli slot
+POINT_DT   = 2.0       # tempo deterministico CP-SAT per risoluzione (≈ secondi)
+
+_W: dict = {}          # stato del worker: candidati, matrice, template
+
+
+def _init_worker(cand: pd.DataFrame, mat_src, uri2idx: dict, max_slots: int, det_time: float):
+    D = open_shared(mat_src)
+    slots = list(range(START_H, START_H + max_slots))
+    model, sel = build_model(cand, slots)
+    # y[p] = POI p nel tour: i tagli del budget si scrivono su queste variabili
+    y = {}
+    for (s, p), v in sel.items():
+        y.setdefault(p, []).append(v)
+    for p, vs in y.items():
+        y[p] = model.NewBoolVar(f"y_{p}")
+        model.Add(sum(vs) == y[p])
+    rows = np.array([uri2idx[u] for u in cand["uri"]])
+    _W.update(cand=cand, slots=slots, model=model, sel=sel, y=y,
+              w=(cand["score"] * 100).astype(int), pos={p: i for i, p in enumerate(cand.index)},
+              Dc=np.asarray(D[np.ix_(rows, rows)], dtype=float), det_time=det_time)
+
+
+def walk_s(tour: pd.DataFrame) -> float:
+    """Cammino minimo fra le tappe di ``tour`` con partenza libera (inf se impossibile)."""
+    if len(tour) < 2:
+        return 0.0
+    ix = [_W["pos"][p] for p in tour["idx"]]
+    W = np.zeros((len(ix) + 1, len(ix) + 1))
+    W[1:, 1:] = _W["Dc"][np.ix_(ix, ix)]                 # riga/colonna 0 = partenza fittizia
+    np.fill_diagonal(W, np.inf)
+    path, _ = astar(W, 0)
+    if path is None:
+        return np.inf
+    return float(sum(W[a, b] for a, b in zip(path[1:-1], path[2:])))
+
+
+def _minimal_over(tour: pd.DataFrame, budget_s: float) -> list:
+    """POI di ``tour`` ridotti (uno alla volta) finché il cammino resta > budget:
+    il no-good su questo sottoinsieme esclude anche tutti i suoi sovrainsiemi."""
+    keep = list(tour["idx"])
+    for p in list(keep):
+        rest = [q for q in keep if q != p]
+        if len(rest) > 1 and walk_s(pd.DataFrame({"idx": rest})) > budget_s:
+            keep = rest
+    return keep
+
+
+def _greedy_sets(n_slots: int, budget_s: float) -> list:
+    """Da ogni POI: aggiunge il POI di score più alto che, inserito nel punto
+    più economico del cammino, lo lascia nel budget (a parità, il più vicino).
+    Il cammino per inserimento è un limite superiore dell'A*: ogni insieme sta
+    nel budget. Restituisce gli insiemi (posizioni in cand) dal migliore."""
+    Dc, score = _W["Dc"], _W["w"].to_numpy()
+    out = []
+    for seed in range(len(Dc)):
+        path, cost = [seed], 0.0
+        free = np.ones(len(Dc), dtype=bool)
+        free[seed] = False
+        while len(path) < n_slots:
+            P = np.array(path)
+            ins = np.vstack([Dc[:, P[0]], Dc[P[-1], :],
+                             Dc[P[:-1], :] + Dc[:, P[1:]].T - Dc[P[:-1], P[1:]][:, None]])
+            pos, add = ins.argmin(axis=0), ins.min(axis=0)
+            ok = free & (cost + add <= budget_s)
+            if not ok.any():
+                break
+            q = max(np.flatnonzero(ok), key=lambda q: (score[q], -add[q]))
+            at = {0: 0, 1: len(path)}.get(pos[q], pos[q] - 1)
+            path.insert(at, q)
+            cost += add[q]
+            free[q] = False
+        out.append((int(score[path].sum()), -cost, sorted(path)))
+    uniq = {tuple(p): (sc, c) for sc, c, p in out}
+    return [list(p) for p, _ in sorted(uniq.items(), key=lambda kv: kv[1], reverse=True)]
+
+
+def _fit_slots(model, x: dict, y: dict, members: list):
+    """Tour con esattamente i POI ``members`` se gli slot (orari, tipi) lo
+    permettono, altrimenti None."""
+    m = model.clone()
+    mx = {k: m.get_bool_var_from_proto_index(v.index) for k, v in x.items()}
+    for p, v in y.items():
+        m.Add(m.get_bool_var_from_proto_index(v.index) == int(p in members))
+    solver = cp_model.CpSolver()
+    solver.parameters.max_deterministic_time = _W["det_time"] / 10
+    solver.parameters.num_workers = 1
+    if solver.Solve(m) not in (cp_model.OPTIMAL, cp_model.FEASIBLE):
+        return None
+    return tour_rows(_W["cand"], _W["slots"], mx, solver.BooleanValue)
+
+
+def _best_single(x: dict, on: set):
+    """Incumbent di partenza: il POI migliore aperto in uno slot attivo."""
+    cand, w = _W["cand"], _W["w"]
+    keys = [k for k in x if k[0] in on]
+    if not keys:
+        return None
+    k = max(keys, key=lambda k: (w[k[1]], -k[0]))
+    return tour_rows(cand, _W["slots"], x, lambda v: v is x[k])
+
+
+def solve_point(budget_min: float, n_slots: int, inc: pd.DataFrame | None = None):
+    """Un punto della griglia. ``inc`` = miglior tour nel budget già noto (stesso
+    budget, meno slot). Restituisce (dict con score e cammino, nuovo incumbent)."""
+    cand, sel, Dc, w = _W["cand"], _W["sel"], _W["Dc"], _W["w"]
+    budget_s = budget_min * 60
+    model = _W["model"].clone()
+    x = {k: model.get_bool_var_from_proto_index(v.index) for k, v in sel.items()}
+    y = {p: model.get_bool_var_from_proto_index(v.index) for p, v in _W["y"].items()}
+    on = set(_W["slots"][:n_slots])
+    for (s, p), v in x.items():
+        if s not in on:
+            model.Add(v == 0)
+
+    pos = _W["pos"]
+    keys = list(y)
+    ix = [pos[p] for p in keys]
+    far = np.minimum(Dc, Dc.T)[np.ix_(ix, ix)] > budget_s
+    for i, j in zip(*np.nonzero(np.triu(far, 1))):
+        model.Add(y[keys[i]] + y[keys[j]] <= 1)
+
+    index = _W["cand"].index
+    for tour in [_best_single(x, on)] + [
+            _fit_slots(model, x, y, [index[i] for i in g])
+            for g in _greedy_sets(n_slots, budget_s)[:GREEDY_TRY]]:
+        if tour is not None and (inc is None or tour["score"].sum() > inc["score"].sum()):
+            inc = tour
+    out = dict(budget_min=budget_min, slots=n_slots, score=None, walk_min=None,
+               stops=0, rounds=0, status="INFEASIBLE")
+    if inc is None:
+        return out, None
+    # hint + solo tour strettamente migliori dell'incumbent
+    chosen = set(zip(inc["slot"].str[:2].astype(int), inc["idx"]))
+    for k, v in x.items():
+        model.AddHint(v, k in chosen)
+    model.Add(sum(int(w[p]) * v for (s, p), v in x.items()) >= int(w[inc["idx"]].sum()) + 1)
+    out.update(score=float(inc["score"].sum()), walk_min=walk_s(inc) / 60,
+               stops=len(inc), status="INCUMBENT")
+
+    solver = cp_model.CpSolver()
+    solver.parameters.max_deterministic_time = _W["det_time"]
+    solver.parameters.num_workers = 1
+    solver.parameters.random_seed = 0
+    # con i tagli a coppie il rilassamento LP di base è debole: al livello 2
+    # CP-SAT chiude la prova di ottimalità in una frazione del limite
+    solver.parameters.linearization_level = 2
+    for r in range(1, MAX_ROUNDS + 1):
+        out["rounds"] = r
+        status = solver.Solve(model)
+        if status not in (cp_model.OPTIMAL, cp_model.FEASIBLE):
+            break                                    # nessun tour migliore: resta l'incumbent
+        tour = tour_rows(cand, _W["slots"], x, solver.BooleanValue)
+        walk = walk_s(tour)
+        if walk <= budget_s:
+            inc = tour
+            out.update(score=float(tour["score"].sum()), walk_min=walk / 60,
+                       stops=len(tour), status=solver.StatusName(status))
+            if status == cp_model.OPTIMAL:
+                break
+            # FEASIBLE: nuovo incumbent, si cerca ancora un tour migliore
+            model.Add(sum(int(w[p]) * v for (s, p), v in x.items()) >= int(w[tour["idx"]].sum()) + 1)
+            continue
+        # no-good: questo insieme di POI sfora il budget
+        model.AddBoolOr([y[p].Not() for p in _minimal_over(tour, budget_s)])
+    return out, inc
+
+
+def solve_budget(task):
+    """Tutti i punti di un budget, slot in ordine crescente (incumbent condiviso)."""
+    budget_min, slots = task
+    rows, inc = [], None
+    for n in sorted(slots):
+        row, inc = solve_point(budget_min, n, inc)
+        rows.append(row)
+    return rows
+
+
+def pareto_front(df: pd.DataFrame) -> pd.Series:
+    """True per i punti non dominati (meno cammino, più score)."""
+    ok = df["score"].notna()
+    front = pd.Series(False, index=df.index)
+    best = -np.inf
+    for i in df[ok].sort_values(["walk_min", "score"], ascending=[True, False]).index:
+        if df.at[i, "score"] > best:
+            front[i] = True
+            best = df.at[i, "score"]
+    return front
+
+
+def sweep(poi: pd.DataFrame, mat_src, uri2idx: dict, budgets, slots,
+          candidates: int = CANDIDATES, det_time: float = POINT_DT,
+          workers: int | None = None) -> pd.DataFrame:
+    """Griglia budgets × slots, un budget per task in parallelo; restituisce
+    una riga per punto con la colonna ``pareto``."""
+    cand = poi[poi["uri"].isin(uri2idx)].nlargest(candidates, "score")
+    tasks = [(float(b), [int(s) for s in slots]) for b in budgets]
+    initargs = (cand, mat_src, uri2idx, max(slots), det_time)
+    workers = min(workers or os.cpu_count() or 1, len(tasks))
+    if workers <= 1:
+        _init_worker(*initargs)
+        parts = list(map(solve_budget, tasks))
+    else:
+        with ProcessPoolExecutor(workers, initializer=_init_worker, initargs=initargs) as ex:
+            parts = list(ex.map(solve_budget, tasks))
+    df = pd.DataFrame([r for rows in parts for r in rows])
+    df["pareto"] = pareto_front(df)
+    return df
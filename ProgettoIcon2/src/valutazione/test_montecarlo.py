@@ -0,0 +1,57 @@
+"""Campionamento delle baseline Monte-Carlo."""
+import numpy as np
+import pytest
+
+from montecarlo import sample_random, sample_greedy, simulate, summarize
+
+
+def test_sample_random_distinct_and_uniform():
+    rng = np.random.default_rng(0)
+    idx = sample_random(rng, 20, 20000, 5)
+    assert idx.shape == (20000, 5)
+    assert idx.min() >= 0 and idx.max() < 20
+    assert all(len(set(r)) == 5 for r in idx[:500])
+    # ogni POI compare ~ 5/20 delle volte, in ogni posizione ~ 1/20
+    freq = np.bincount(idx.ravel(), minlength=20) / idx.size
+    assert np.allclose(freq, 1 / 20, atol=0.01)
+    assert np.allclose(np.bincount(idx[:, 0], minlength=20) / len(idx), 1 / 20, atol=0.01)
+
+
+def test_sample_random_k_equals_n():
+    idx = sample_random(np.random.default_rng(1), 6, 50, 6)
+    assert (np.sort(idx, axis=1) == np.arange(6)).all()
+
+
+def test_sample_greedy_uses_pool():
+    rng = np.random.default_rng(2)
+    D = rng.random((30, 30)) * 1000
+    best = np.arange(10, 18)
+    idx = sample_greedy(rng, D, best, 100, 4)
+    assert np.isin(idx, best).all()
+    assert all(len(set(r)) == 4 for r in idx)
+
+
+def test_simulate_empty_route():
+    D = np.random.default_rng(3).random((10, 10)) * 600
+    res = simulate(D, np.linspace(0.1, 1, 10), k=0, n=50, workers=1)
+    for t, sc in res.values():
+        assert t.shape == sc.shape == (50,)
+        assert not t.any() and not sc.any()
+
+
+def test_simulate_k_above_scored_rows():
+    scores = np.full(10, np.nan)
+    scores[:3] = 1.0
+    with pytest.raises(ValueError):
+        simulate(np.zeros((10, 10)), scores, k=4, n=10, workers=1)
+
+
+def test_rank_pct_direction():
+    vals = np.arange(1.0, 11.0)                        # 1 … 10
+    # tempo 3: più veloce delle 7 route con tempo > 3
+    assert summarize(vals, 3.0, higher_is_better=False)["rank_pct"] == 70
+    # score 3: meglio delle 2 route con score < 3
+    assert summarize(vals, 3.0, higher_is_better=True)["rank_pct"] == 20
+    with pytest.raises(ValueError):
+        summarize(vals, 3.0)
+    assert "rank_pct" not in summarize(vals)
@@ -0,0 +1,53 @@
+"""Estremi dello sweep Pareto e frontiera."""
+import numpy as np
+import pandas as pd
+
+from pareto import sweep, pareto_front
+
+
+def test_one_slot_tour_has_zero_walk(city):
+    poi, D, uri2idx = city
+    df = sweep(poi, D, uri2idx, budgets=[0, 60], slots=[1], workers=1, det_time=1.0)
+    assert (df["stops"] == 1).all()
+    assert (df["walk_min"] == 0).all()
+    assert np.allclose(df["score"], poi["score"].max(), atol=0.01)
+
+
+def test_endpoints(city):
+    poi, D, uri2idx = city
+    df = sweep(poi, D, uri2idx, budgets=[0, 10_000], slots=[1, 4], workers=1, det_time=1.0)
+    by = df.set_index(["budget_min", "slots"])
+    # budget nullo: al più una tappa; budget illimitato: tutti gli slot pieni
+    assert by.loc[(0, 4), "stops"] == 1
+    assert by.loc[(10_000, 4), "stops"] == 4
+    assert np.isclose(by.loc[(10_000, 4), "score"], poi["score"].nlargest(4).sum(), atol=0.01)
+    assert by.loc[(10_000, 4), "pareto"]
+
+
+def test_pareto_front():
+    df = pd.DataFrame({"walk_min": [10, 20, 20, 30, 5, None],
+                       "score":    [2.0, 3.0, 2.5, 2.9, 2.0, None]})
+    assert list(pareto_front(df)) == [False, True, False, False, True, False]
+
+
+def test_deterministic_and_monotone_in_slots(make_city):
+    poi, D, uri2idx = make_city(30, seed=4, asym=0.3)
+    kw = dict(budgets=[5, 15, 40], slots=[2, 4, 6], det_time=0.5)
+    a = sweep(poi, D, uri2idx, workers=1, **kw)
+    b = sweep(poi, D, uri2idx, workers=2, **kw)
+    pd.testing.assert_frame_equal(a, b)
+    assert a["score"].notna().all()
+    assert (a["walk_min"] <= a["budget_min"] + 1e-6).all()
+    for _, g in a.sort_values("slots").groupby("budget_min"):
+        assert g["score"].is_monotonic_increasing
+
+
+def test_asymmetric_pair_is_allowed():
+    # 0→1 oltre il budget, 1→0 dentro: il tour {0, 1} è percorribile partendo da 1
+    poi = pd.DataFrame({"uri": ["a", "b", "c"], "label": ["A", "B", "C"],
+                        "type": ["Museum", "Park", "Church"], "score": [1.0, 0.9, 0.1],
+                        "cluster": 0, "open": "00:00", "close": "24:00"})
+    D = np.array([[0, 1200, 5000], [300, 0, 5000], [5000, 5000, 0]], dtype="float32")
+    df = sweep(poi, D, {"a": 0, "b": 1, "c": 2}, budgets=[10], slots=[2], workers=1, det_time=0.5)
+    r = df.iloc[0]
+    assert r["stops"] == 2 and np.isclose(r["score"], 1.9) and np.isclose(r["walk_min"], 5)